@@ -0,0 +1,100 @@
+"""
+Cart-hold mode: adding a product to the cart sets its units aside for a
+while, so availability checks see what other shoppers are about to buy
+and checkouts fail early instead of at payment time.
+
+Available stock is `stock_quantity` minus the active holds of other carts,
+an aggregate over the (product, expires_at) index. Holds are written under
+a row lock on the product so two carts cannot take the same last unit.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.models import Product
+from .models import StockHold
+
+
+class HoldUnavailable(Exception):
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f"Only {available} items available in stock")
+
+
+def holds_enabled():
+    return getattr(settings, 'CART_HOLDS_ENABLED', False)
+
+
+def hold_ttl():
+    return timedelta(seconds=getattr(settings, 'CART_HOLD_TTL', 15 * 60))
+
+
+def active_holds(now=None):
+    return StockHold.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def held_by_others(cart=None, now=None):
+    """
+    Subquery: units of the outer product held by carts other than `cart`.
+    """
+    holds = active_holds(now).filter(product=OuterRef('pk'))
+    if cart is not None:
+        holds = holds.exclude(cart=cart)
+    total = holds.order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(total), Value(0))
+
+
+def available_stock(product_id, cart=None):
+    """Stock of `product_id` not held by other carts (holds mode or not)."""
+    if not holds_enabled():
+        return Product.objects.values_list('stock_quantity', flat=True).get(pk=product_id)
+    row = (Product.objects
+        .filter(pk=product_id)
+        .annotate(held=held_by_others(cart))
+        .values_list('stock_quantity', 'held')
+        .get())
+    return max(row[0] - row[1], 0)
+
+
+def hold_stock(cart, product, quantity):
+    """
+    Hold `quantity` units of `product` for `cart` (replacing its previous
+    hold) and restart the expiry. Raises HoldUnavailable if other carts'
+    holds leave less than that.
+    """
+    with transaction.atomic():
+        # Serializes hold changes per product (the row stays locked until
+        # commit); other products are unaffected.
+        Product.objects.select_for_update().only('pk').get(pk=product.pk)
+        available = available_stock(product.pk, cart)
+        if quantity > available:
+            raise HoldUnavailable(available)
+        StockHold.objects.update_or_create(
+            cart=cart, product=product,
+            defaults={'quantity': quantity, 'expires_at': timezone.now() + hold_ttl()},
+        )
+
+
+def release_holds(cart, product_ids=None):
+    holds = StockHold.objects.filter(cart=cart)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    holds.delete()
+
+
+def sweep_expired_holds(batch_size=1000, now=None):
+    """
+    Delete expired holds in batches of `batch_size`, each its own short
+    transaction. Returns the number deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(StockHold.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += StockHold.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from cart.store import CachedCartStore, get_cart_store
+
+
+class Command(BaseCommand):
+    help = "Write carts changed in the cached cart store back to the Cart/CartItem tables. With --interval, keep flushing every N seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help="Seconds between flushes (default: flush once).")
+
+    def handle(self, *args, **options):
+        store = get_cart_store()
+        if not isinstance(store, CachedCartStore):
+            self.stdout.write("CART_STORE does not write behind; nothing to flush.")
+            return
+        while True:
+            flushed = store.flush_dirty()
+            self.stdout.write(f"Flushed {flushed} carts.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from cart.holds import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Delete expired cart stock holds in batches. With --interval, keep sweeping every N seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=int, default=0, help="Seconds between sweeps (default: sweep once).")
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = sweep_expired_holds(batch_size=options['batch_size'])
+            self.stdout.write(f"Released {deleted} expired holds.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
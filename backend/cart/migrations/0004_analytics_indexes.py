@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_stock_holds'),
+        ('products', '0006_product_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['added_at', 'cart'], name='cart_cartit_added_a_7af5ac_idx'),
+        ),
+    ]
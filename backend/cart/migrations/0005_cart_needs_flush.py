@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_analytics_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='needs_flush',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('needs_flush', True)), fields=['needs_flush'], name='cart_needs_flush_idx'),
+        ),
+    ]
@@ -7,9 +7,46 @@ from products.models import Product
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set while the cached cart store holds changes not yet written to
+    # CartItem (cart/store.py); `flush_carts` works through these carts.
+    needs_flush = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['needs_flush'], condition=models.Q(needs_flush=True), name='cart_needs_flush_idx'),
+        ]
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['added_at', 'cart']),
+        ]
+
+
+class StockHold(models.Model):
+    """
+    Units of a product set aside for a cart until `expires_at` (cart-hold
+    mode, see cart/holds.py). Expired rows no longer count and are removed
+    by the `sweep_cart_holds` command.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='holds')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_holds')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_hold_per_cart_product'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held until {self.expires_at}"
@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    One step of a batch cart update: `add` increases a product's quantity,
+    `set` replaces it (0 removes the item) and `remove` drops the item.
+    """
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        if data['op'] == 'add' and data.setdefault('quantity', 1) < 1:
+            raise serializers.ValidationError("Quantity to add must be at least 1.")
+        if data['op'] == 'set' and 'quantity' not in data:
+            raise serializers.ValidationError("Quantity is required for 'set'.")
+        return data
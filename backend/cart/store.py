@@ -0,0 +1,354 @@
+"""
+Cart storage backends.
+
+Views read and change carts through `get_cart_store()`, selected by the
+CART_STORE setting:
+
+- `DatabaseCartStore` (default) reads and writes Cart/CartItem directly.
+- `CachedCartStore` keeps a compact copy of each cart in Django's cache and
+  serves reads from it. New items are inserted right away (the row id is
+  the item id clients use); quantity changes and removals are written
+  behind: they are counted in a per-user cache counter and `flush_carts`
+  (or the checkout consistency check) brings the tables in line. The first
+  pending change also sets `Cart.needs_flush`, which is how `flush_carts`
+  finds the carts to write. Changes to one user's cart (and its flushes)
+  run one at a time under a short cache lock, so overlapping requests
+  never overwrite each other's cached state. It needs a cache shared by
+  all workers (Redis, Memcached); the local-memory cache is only suitable
+  for tests and single-process setups.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+
+class CartLine(NamedTuple):
+    item_id: int
+    product_id: int
+    quantity: int
+
+
+def _plan(items, quantities):
+    """
+    Split target quantities into (new (product_id, quantity) pairs, changed
+    CartItems, removed item ids) given the current `items` by product id.
+    """
+    new, changed, removed = [], [], []
+    for product_id, quantity in quantities.items():
+        item = items.get(product_id)
+        if quantity <= 0:
+            if item is not None:
+                removed.append(item.id)
+        elif item is None:
+            new.append((product_id, quantity))
+        elif item.quantity != quantity:
+            item.quantity = quantity
+            changed.append(item)
+    return new, changed, removed
+
+
+def _serialized(method):
+    """Run a CachedCartStore method taking `user` under that user's cart lock."""
+    @wraps(method)
+    def wrapper(self, user, *args, **kwargs):
+        with self._locked(user.pk):
+            return method(self, user, *args, **kwargs)
+    return wrapper
+
+
+def get_cart_store():
+    return import_string(getattr(settings, 'CART_STORE', 'cart.store.DatabaseCartStore'))()
+
+
+class DatabaseCartStore:
+    def get_cart(self, user):
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return cart
+
+    def lines(self, user):
+        rows = (CartItem.objects
+            .filter(cart__user=user)
+            .order_by('added_at', 'id')
+            .values_list('id', 'product_id', 'quantity'))
+        return [CartLine(*row) for row in rows]
+
+    def get_line(self, user, item_id):
+        row = (CartItem.objects
+            .filter(cart__user=user, id=item_id)
+            .values_list('id', 'product_id', 'quantity')
+            .first())
+        return CartLine(*row) if row else None
+
+    def find_line(self, user, product_id):
+        row = (CartItem.objects
+            .filter(cart__user=user, product_id=product_id)
+            .values_list('id', 'product_id', 'quantity')
+            .first())
+        return CartLine(*row) if row else None
+
+    def add_line(self, user, product_id, quantity):
+        item = CartItem.objects.create(cart=self.get_cart(user), product_id=product_id, quantity=quantity)
+        return CartLine(item.id, product_id, quantity)
+
+    def set_quantity(self, user, line, quantity):
+        CartItem.objects.filter(id=line.item_id).update(quantity=quantity)
+        return line._replace(quantity=quantity)
+
+    def remove(self, user, line):
+        CartItem.objects.filter(id=line.item_id).delete()
+
+    def apply_quantities(self, user, quantities):
+        """
+        Set the quantity of several products at once ({product_id:
+        quantity}, 0 removes) with one read, one bulk insert, one bulk
+        update and one delete. Returns the cart's lines.
+        """
+        with transaction.atomic():
+            items = {item.product_id: item for item in CartItem.objects.filter(cart__user=user, product_id__in=quantities)}
+            new, changed, removed = _plan(items, quantities)
+            if new:
+                cart = self.get_cart(user)
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, product_id=product_id, quantity=quantity) for product_id, quantity in new
+                ])
+            if changed:
+                CartItem.objects.bulk_update(changed, ['quantity'])
+            if removed:
+                CartItem.objects.filter(id__in=removed).delete()
+        return self.lines(user)
+
+    def clear(self, user):
+        """Empty the cart; returns the number of items removed."""
+        return CartItem.objects.filter(cart__user=user).delete()[0]
+
+    def sync(self, user):
+        """Make sure the Cart/CartItem tables are current; True if they were."""
+        return True
+
+
+class CachedCartStore(DatabaseCartStore):
+    KEY = 'cart:state:{user_id}'
+    DIRTY_KEY = 'cart:dirty:{user_id}'
+    LOCK_KEY = 'cart:lock:{user_id}'
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'CART_STORE_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'CART_STORE_TTL', 24 * 3600)
+
+    # State: {'cart_id': int, 'items': [[item_id, product_id, quantity], ...]}
+    # DIRTY_KEY counts the changes not yet written to the tables.
+
+    @contextmanager
+    def _locked(self, user_id):
+        """
+        Hold the user's cart lock. It expires after CART_STORE_LOCK_TIMEOUT
+        seconds, so a worker that dies holding it only delays the others.
+        """
+        key = self.LOCK_KEY.format(user_id=user_id)
+        token = uuid.uuid4().hex
+        while not self.cache.add(key, token, getattr(settings, 'CART_STORE_LOCK_TIMEOUT', 10)):
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def _state(self, user):
+        state = self.cache.get(self.KEY.format(user_id=user.pk))
+        if state is None:
+            state = self._load(user)
+        return state
+
+    def _load(self, user, replace=False):
+        cart = super().get_cart(user)
+        state = {
+            'cart_id': cart.pk,
+            'items': [list(line) for line in super().lines(user)],
+        }
+        key = self.KEY.format(user_id=user.pk)
+        if replace:
+            self.cache.set(key, state, self.timeout)
+        elif not self.cache.add(key, state, self.timeout):
+            # Reads load without the lock; never replace a writer's state
+            state = self.cache.get(key) or state
+        return state
+
+    def _save(self, user, state, dirty):
+        self.cache.set(self.KEY.format(user_id=user.pk), state, self.timeout)
+        if dirty and self._mark_dirty(user.pk) == 1:
+            # First change since the last flush
+            Cart.objects.filter(pk=state['cart_id']).update(needs_flush=True)
+
+    def _mark_dirty(self, user_id):
+        """Count one more pending change (atomically); returns the new count."""
+        key = self.DIRTY_KEY.format(user_id=user_id)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, None):
+                return 1
+            return self.cache.incr(key)
+
+    def get_cart(self, user):
+        return Cart(pk=self._state(user)['cart_id'], user=user)
+
+    def lines(self, user):
+        return [CartLine(*item) for item in self._state(user)['items']]
+
+    def get_line(self, user, item_id):
+        return next((line for line in self.lines(user) if line.item_id == item_id), None)
+
+    def find_line(self, user, product_id):
+        return next((line for line in self.lines(user) if line.product_id == product_id), None)
+
+    @_serialized
+    def add_line(self, user, product_id, quantity):
+        state = self._state(user)
+        item = CartItem.objects.create(cart_id=state['cart_id'], product_id=product_id, quantity=quantity)
+        state['items'].append([item.id, product_id, quantity])
+        self._save(user, state, dirty=False)
+        return CartLine(item.id, product_id, quantity)
+
+    @_serialized
+    def set_quantity(self, user, line, quantity):
+        state = self._state(user)
+        for item in state['items']:
+            if item[0] == line.item_id:
+                item[2] = quantity
+        self._save(user, state, dirty=True)
+        return line._replace(quantity=quantity)
+
+    @_serialized
+    def remove(self, user, line):
+        state = self._state(user)
+        state['items'] = [item for item in state['items'] if item[0] != line.item_id]
+        self._save(user, state, dirty=True)
+
+    @_serialized
+    def apply_quantities(self, user, quantities):
+        state = self._state(user)
+        items = {}
+        for item in state['items']:
+            items[item[1]] = CartItem(id=item[0], product_id=item[1], quantity=item[2])
+        new, changed, removed = _plan(items, quantities)
+        created = CartItem.objects.bulk_create([
+            CartItem(cart_id=state['cart_id'], product_id=product_id, quantity=quantity) for product_id, quantity in new
+        ])
+        quantity_by_id = {item.id: item.quantity for item in changed}
+        state['items'] = [
+            [item[0], item[1], quantity_by_id.get(item[0], item[2])]
+            for item in state['items'] if item[0] not in removed
+        ] + [[item.id, item.product_id, item.quantity] for item in created]
+        self._save(user, state, dirty=bool(changed or removed))
+        return [CartLine(*item) for item in state['items']]
+
+    @_serialized
+    def clear(self, user):
+        # Written through: it happens once per checkout and must not be lost.
+        state = self._state(user)
+        removed = len(state['items'])
+        CartItem.objects.filter(cart_id=state['cart_id']).delete()
+        state['items'] = []
+        self.cache.set(self.KEY.format(user_id=user.pk), state, self.timeout)
+        return removed
+
+    def flush(self, user_id):
+        """
+        Write a dirty cached cart to the tables. Returns True if it wrote.
+
+        It holds the cart lock, so the cart it writes cannot gain an item
+        it would then delete as stale. Changes counted after it starts keep
+        the cart dirty: the flag is cleared before the counter is read, and
+        only the changes counted up to then are subtracted afterwards.
+        """
+        with self._locked(user_id):
+            return self._flush(user_id)
+
+    def _flush(self, user_id):
+        dirty_key = self.DIRTY_KEY.format(user_id=user_id)
+        if not self.cache.get(dirty_key):
+            return False
+        Cart.objects.filter(user_id=user_id, needs_flush=True).update(needs_flush=False)
+        pending = self.cache.get(dirty_key)
+        state = self.cache.get(self.KEY.format(user_id=user_id))
+        if state is not None:
+            self._write(state)
+        if pending:
+            try:
+                remaining = self.cache.decr(dirty_key, pending)
+            except ValueError:
+                # Counter evicted meanwhile; a later change starts a new one
+                remaining = 0
+            if remaining > 0:
+                Cart.objects.filter(user_id=user_id).update(needs_flush=True)
+        return state is not None
+
+    def _write(self, state):
+        """Bring the CartItem rows of a cached cart in line with it."""
+        quantities = {item[0]: item[2] for item in state['items']}
+        with transaction.atomic():
+            rows = dict(CartItem.objects.filter(cart_id=state['cart_id']).values_list('id', 'quantity'))
+            stale = [item_id for item_id in rows if item_id not in quantities]
+            changed = [
+                CartItem(id=item_id, quantity=quantity)
+                for item_id, quantity in quantities.items()
+                if item_id in rows and rows[item_id] != quantity
+            ]
+            if stale:
+                CartItem.objects.filter(id__in=stale).delete()
+            if changed:
+                CartItem.objects.bulk_update(changed, ['quantity'])
+
+    def flush_dirty(self):
+        """Flush every cart marked dirty; returns how many were written."""
+        user_ids = Cart.objects.filter(needs_flush=True).values_list('user_id', flat=True)
+        flushed = 0
+        for user_id in user_ids.iterator():
+            if self.flush(user_id):
+                flushed += 1
+            elif not self.cache.get(self.DIRTY_KEY.format(user_id=user_id)):
+                # Counter evicted, or flushed by a checkout in the meantime.
+                # Clear the flag, then look again for a change made since.
+                Cart.objects.filter(user_id=user_id).update(needs_flush=False)
+                flushed += self.flush(user_id)
+        return flushed
+
+    def sync(self, user):
+        """
+        Checkout consistency check: flush pending writes, then compare the
+        cached cart with the tables. On a mismatch (an evicted dirty entry,
+        an edit made outside the store) the tables win and the cache is
+        reloaded from them.
+        """
+        with self._locked(user.pk):
+            return self._sync(user)
+
+    def _sync(self, user):
+        self._flush(user.pk)
+        state = self.cache.get(self.KEY.format(user_id=user.pk))
+        if state is None:
+            return True
+        cached = [tuple(item) for item in state['items']]
+        stored = [tuple(line) for line in super().lines(user)]
+        if sorted(cached) == sorted(stored):
+            return True
+        logger.warning(f"Cached cart of user {user.pk} disagreed with the database; reloaded")
+        self._load(user, replace=True)
+        return False
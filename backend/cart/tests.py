@@ -1,3 +1,337 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from products.models import Category, Product, ProductImage
+from users.models import User
+from .holds import available_stock
+from .models import Cart, CartItem, StockHold
+from .store import get_cart_store
+
+
+class ViewCartTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Heels', type='women')
+
+    def add_items(self, count, price=100, discount=None):
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'Item {i}', description='d', price=price, discount_price=discount,
+                stock_quantity=10, category=self.category,
+            )
+            ProductImage.objects.create(product=product, image=f'product_images/{i}.jpg')
+            ProductImage.objects.create(product=product, image=f'product_images/{i}b.jpg')
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/cart/view/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.add_items(1)
+        few = self.count_queries()
+        self.add_items(10)
+        self.assertEqual(self.count_queries(), few)
+
+    def test_totals(self):
+        self.add_items(2, price=100, discount=10)
+        data = self.client.get('/api/cart/view/').json()
+        self.assertEqual([item['product_price'] for item in data['items']], [90.0, 90.0])
+        self.assertEqual(data['items'][0]['total'], 180.0)
+        self.assertEqual(data['total_price'], 360.0)
+        self.assertTrue(data['items'][0]['product_image'].endswith('product_images/0.jpg'))
+
+    def test_add_to_cart_and_checkout_use_the_same_prices(self):
+        product = Product.objects.create(
+            name='Sandal', description='d', price='99.99', discount_price=15,
+            stock_quantity=10, category=self.category,
+        )
+        added = self.client.post('/api/cart/add/', {'product_id': product.id, 'quantity': 3}).json()
+        cart = self.client.get('/api/cart/view/').json()
+        self.assertEqual(added['item']['price'], 84.99)
+        self.assertEqual(cart['items'][0]['product_price'], 84.99)
+        self.assertEqual(cart['total_price'], 254.97)
+
+        response = self.client.post('/api/orders/create/', {
+            'items': [{'product_id': product.id, 'quantity': 3, 'price': '1.00'}],
+            'shipping_address': 'Cairo',
+            'payment_status': 'cod',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Decimal(response.json()['order']['total_price']), Decimal('254.97'))
+        self.assertEqual(response.json()['order']['items'][0]['price'], '84.99')
+
+
+@override_settings(CART_HOLDS_ENABLED=True, CART_HOLD_TTL=600)
+class StockHoldTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Heels', type='women')
+        self.product = Product.objects.create(
+            name='Drop', description='d', price=100, stock_quantity=3, category=category)
+        self.clients = []
+        for name in ('a', 'b'):
+            user = User.objects.create_user(email=f'{name}@example.com', username=name, password='pass')
+            client = APIClient()
+            client.force_authenticate(user)
+            self.clients.append(client)
+
+    def add(self, client, quantity):
+        return client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': quantity})
+
+    def test_holds_reduce_availability_for_other_carts(self):
+        a, b = self.clients
+        self.assertEqual(self.add(a, 2).status_code, 200)
+        response = self.add(b, 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Only 1 items available in stock')
+        self.assertEqual(self.add(b, 1).status_code, 200)
+        self.assertEqual(available_stock(self.product.id), 0)
+
+    @skipUnless(connection.features.has_select_for_update, 'needs row locks')
+    def test_hold_locks_the_product_row(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.add(self.clients[0], 1)
+        self.assertTrue(any(
+            'FOR UPDATE' in query['sql'] and 'products_product' in query['sql'] for query in ctx.captured_queries))
+
+    def test_expired_holds_stop_counting_and_are_swept(self):
+        a, b = self.clients
+        self.add(a, 3)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.add(b, 3).status_code, 200)
+        out = StringIO()
+        call_command('sweep_cart_holds', '--batch-size', '1', stdout=out)
+        self.assertIn('Released 1 expired holds', out.getvalue())
+        self.assertEqual(StockHold.objects.count(), 1)
+
+    def test_checkout_respects_other_holds_and_consumes_its_own(self):
+        a, b = self.clients
+        self.add(a, 2)
+        self.add(b, 1)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=3)
+
+        def checkout(client, quantity):
+            return client.post('/api/orders/create/', {
+                'items': [{'product_id': self.product.id, 'quantity': quantity}],
+                'shipping_address': 'Cairo',
+                'payment_status': 'cod',
+            }, format='json')
+
+        self.assertEqual(checkout(b, 2).status_code, 400)
+        self.assertEqual(checkout(b, 1).status_code, 201)
+        self.assertEqual(StockHold.objects.get().quantity, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+
+    def test_checkout_releases_the_holds_of_unordered_cart_lines(self):
+        a, b = self.clients
+        other = Product.objects.create(
+            name='Other', description='d', price=100, stock_quantity=1, category=self.product.category)
+        self.add(a, 1)
+        a.post('/api/cart/add/', {'product_id': other.id, 'quantity': 1})
+        response = a.post('/api/orders/create/', {
+            'items': [{'product_id': self.product.id, 'quantity': 1}],
+            'shipping_address': 'Cairo',
+            'payment_status': 'cod',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(available_stock(other.id), 1)
+
+
+@override_settings(CART_STORE='cart.store.CachedCartStore')
+class CachedCartStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Heels', type='women')
+        self.product = Product.objects.create(
+            name='Boot', description='d', price=100, stock_quantity=10, category=category)
+
+    def cart_queries(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(*args, **kwargs)
+        return response, [q['sql'] for q in ctx if 'cart_' in q['sql']]
+
+    def test_reads_and_quantity_changes_skip_the_cart_tables(self):
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        item = CartItem.objects.get()
+
+        response, cart_sql = self.cart_queries('get', '/api/cart/view/')
+        self.assertEqual(response.json()['items'][0]['id'], item.id)
+        self.assertEqual(cart_sql, [])
+
+        # The first pending change flags the cart; later ones only touch the cache
+        response, cart_sql = self.cart_queries('post', '/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        self.assertEqual(response.json()['item']['quantity'], 2)
+        self.assertEqual(len(cart_sql), 1)
+        self.assertIn('needs_flush', cart_sql[0])
+        response, cart_sql = self.cart_queries('post', '/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        self.assertEqual(response.json()['item']['quantity'], 3)
+        self.assertEqual(cart_sql, [])
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1)
+
+        out = StringIO()
+        call_command('flush_carts', stdout=out)
+        self.assertIn('Flushed 1 carts', out.getvalue())
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 3)
+
+    def test_checkout_flushes_pending_writes_and_clears_the_cache(self):
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 2})
+        item = CartItem.objects.get()
+        self.client.delete(f'/api/cart/item/{item.id}/')
+        self.assertTrue(CartItem.objects.exists())
+
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        response = self.client.post('/api/orders/create/', {
+            'items': [{'product_id': self.product.id, 'quantity': 1}],
+            'shipping_address': 'Cairo',
+            'payment_status': 'cod',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.get('/api/cart/view/').json(), {'message': 'Your cart is empty!'})
+
+    def test_changes_made_during_a_flush_stay_dirty(self):
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        store = get_cart_store()
+        write = store._write
+
+        def write_then_change(state):
+            write(state)
+            line = store.lines(self.user)[0]
+            store.set_quantity(self.user, line, 5)
+
+        with mock.patch.object(store, '_write', write_then_change):
+            self.assertEqual(store.flush_dirty(), 1)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+        self.assertTrue(Cart.objects.get().needs_flush)
+
+        self.assertEqual(store.flush_dirty(), 1)
+        self.assertEqual(CartItem.objects.get().quantity, 5)
+        self.assertFalse(Cart.objects.get().needs_flush)
+        self.assertEqual(store.flush_dirty(), 0)
+
+    def test_overlapping_writes_wait_for_each_other(self):
+        other = Product.objects.create(
+            name='Sandal', description='d', price=50, stock_quantity=10, category=self.product.category)
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        store = get_cart_store()
+        line = store.lines(self.user)[0]
+        lock_key = store.LOCK_KEY.format(user_id=self.user.pk)
+        cache.add(lock_key, 'other request', 10)
+
+        def other_request_finishes(seconds):
+            # The request holding the lock adds an item, then lets go
+            cache.delete(lock_key)
+            store.add_line(self.user, other.id, 1)
+
+        with mock.patch('cart.store.time.sleep', side_effect=other_request_finishes) as sleep:
+            store.set_quantity(self.user, line, 3)
+        self.assertTrue(sleep.called)
+
+        store.flush_dirty()
+        self.assertEqual(
+            dict(CartItem.objects.values_list('product_id', 'quantity')), {self.product.id: 3, other.id: 1})
+
+    def test_flush_survives_an_evicted_counter(self):
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        store = get_cart_store()
+        dirty_key = store.DIRTY_KEY.format(user_id=self.user.pk)
+        write = store._write
+
+        def write_then_evict(state):
+            write(state)
+            cache.delete(dirty_key)
+
+        with mock.patch.object(store, '_write', write_then_evict):
+            self.assertEqual(store.flush_dirty(), 1)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+        self.assertFalse(Cart.objects.get().needs_flush)
+
+    def test_item_of_a_deleted_product_is_dropped(self):
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        item_id = CartItem.objects.get().id
+        self.product.delete()
+        self.assertEqual(self.client.get(f'/api/cart/item/{item_id}/').status_code, 404)
+        self.assertEqual(get_cart_store().lines(self.user), [])
+
+    def test_sync_reloads_a_cart_changed_behind_the_cache(self):
+        self.client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 2})
+        CartItem.objects.update(quantity=5)
+        store = get_cart_store()
+        self.assertFalse(store.sync(self.user))
+        self.assertEqual(store.lines(self.user)[0].quantity, 5)
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Heels', type='women')
+        self.products = [
+            Product.objects.create(name=f'Shoe {i}', description='d', price=100, stock_quantity=5, category=category)
+            for i in range(12)
+        ]
+
+    def batch(self, operations):
+        return self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+
+    def test_applies_operations_in_order(self):
+        first, second, third = self.products[:3]
+        self.client.post('/api/cart/add/', {'product_id': third.id, 'quantity': 1})
+        response = self.batch([
+            {'op': 'add', 'product_id': first.id, 'quantity': 2},
+            {'op': 'add', 'product_id': first.id},
+            {'op': 'set', 'product_id': second.id, 'quantity': 4},
+            {'op': 'remove', 'product_id': third.id},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        items = {item['product_id']: item['quantity'] for item in response.json()['items']}
+        self.assertEqual(items, {first.id: 3, second.id: 4})
+        self.assertEqual(response.json()['total_price'], 700.0)
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def count_queries(products):
+            CartItem.objects.all().delete()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.batch([{'op': 'add', 'product_id': p.id, 'quantity': 1} for p in products])
+            self.assertEqual(response.status_code, 200, response.content)
+            return len(ctx)
+
+        count_queries(self.products[:1])  # creates the cart
+        few = count_queries(self.products[:2])
+        self.assertEqual(count_queries(self.products), few)
+
+    def test_shortfall_rejects_the_whole_batch(self):
+        response = self.batch([
+            {'op': 'add', 'product_id': self.products[0].id, 'quantity': 1},
+            {'op': 'set', 'product_id': self.products[1].id, 'quantity': 6},
+            {'op': 'add', 'product_id': 999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {str(self.products[1].id), '999'})
+        self.assertFalse(CartItem.objects.exists())
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import AddToCartView, CartItemDetailView, ViewCartView, ClearCartView
+from .views import AddToCartView, CartBatchView, CartItemDetailView, ViewCartView, ClearCartView
 
 urlpatterns = [
     path('add/', AddToCartView.as_view()),  # POST
     path('view/', ViewCartView.as_view()),  # GET
     path('item/<int:item_id>/', CartItemDetailView.as_view()),  # PUT, DELETE
     path('clear/', ClearCartView.as_view(), name='clear_cart'),  # DELETE
+    path('batch/', CartBatchView.as_view(), name='cart_batch'),  # POST
 ]
\ No newline at end of file
@@ -3,9 +3,40 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from .models import Product, Cart, CartItem
-from products.models import ProductImage
+from products.models import primary_image_prefetch
+from products.pricing import PriceBook, price_lines
+from .holds import HoldUnavailable, hold_stock, holds_enabled, release_holds
+from .models import Product
+from .serializers import CartOperationSerializer
+from .store import get_cart_store
+
+
+def cart_products(product_ids):
+    """Products by id with their first image prefetched (two queries)."""
+    return Product.objects.prefetch_related(primary_image_prefetch()).in_bulk(product_ids)
+
+
+def stock_error(cart, product, quantity):
+    """
+    Error response if `quantity` of `product` cannot go in `cart`, else None.
+    In cart-hold mode this also (re)takes the hold.
+    """
+    if holds_enabled():
+        try:
+            hold_stock(cart, product, quantity)
+        except HoldUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return None
+    if quantity > product.stock_quantity:
+        return Response(
+            {'error': f'Only {product.stock_quantity} items available in stock'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
 
 class AddToCartView(APIView):
     permission_classes = [IsAuthenticated]
@@ -15,29 +46,30 @@ class AddToCartView(APIView):
         quantity = int(request.data.get('quantity', 1))
 
         product = get_object_or_404(Product, id=product_id)
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-
-        cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
+        store = get_cart_store()
+        cart = store.get_cart(request.user)
 
-        new_quantity = quantity if created else cart_item.quantity + quantity
+        # Checked before the item is created, so a rejected add leaves no row behind
+        line = store.find_line(request.user, product.id)
+        new_quantity = quantity if line is None else line.quantity + quantity
 
-        if new_quantity > product.stock_quantity:
-            return Response(
-                {'error': f'Only {product.stock_quantity} items available in stock'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        error = stock_error(cart, product, new_quantity)
+        if error:
+            return error
 
-        cart_item.quantity = new_quantity
-        cart_item.save()
+        if line is None:
+            line = store.add_line(request.user, product.id, new_quantity)
+        else:
+            line = store.set_quantity(request.user, line, new_quantity)
 
-        price = product.discount_price if product.discount_price else product.price
-        total = price * cart_item.quantity
+        price = PriceBook.for_request(request).unit_price(product)
+        total = price * line.quantity
 
         return Response({
             'message': 'Product added to cart',
             'item': {
                 'product_name': product.name,
-                'quantity': cart_item.quantity,
+                'quantity': line.quantity,
                 'price': float(price),
                 'total': float(total)
             }
@@ -48,21 +80,31 @@ class AddToCartView(APIView):
 class CartItemDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, item_id):
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-        product = cart_item.product
+    def get_line(self, request, item_id):
+        line = get_cart_store().get_line(request.user, item_id)
+        if line is None:
+            raise Http404
+        return line
 
-        image_obj = ProductImage.objects.filter(product=product).first()
+    def get(self, request, item_id):
+        line = self.get_line(request, item_id)
+        product = cart_products([line.product_id]).get(line.product_id)
+        if product is None:
+            # The product was deleted; drop the line the way the cart view skips it
+            get_cart_store().remove(request.user, line)
+            raise Http404
+
+        image_obj = product.primary_image
         image_url = request.build_absolute_uri(image_obj.image.url) if image_obj and image_obj.image else None
 
-        price = product.discount_price if product.discount_price else product.price
-        total = price * cart_item.quantity
+        price = PriceBook.for_request(request).unit_price(product)
+        total = price * line.quantity
 
         item_data = {
-            'id': cart_item.id,
+            'id': line.item_id,
             'product_name': product.name,
             'product_price': float(price),
-            'quantity': cart_item.quantity,
+            'quantity': line.quantity,
             'total': float(total),
             'product_image': image_url,
         }
@@ -71,77 +113,139 @@ class CartItemDetailView(APIView):
 
     def put(self, request, item_id):
         new_quantity = int(request.data.get('quantity', 1))
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-        product = cart_item.product
-
-        # ✅ تحقق من توفر الكمية في المخزون
-        if new_quantity > product.stock_quantity:
-            return Response(
-                {'error': f'Only {product.stock_quantity} items available in stock'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        store = get_cart_store()
+        line = self.get_line(request, item_id)
+        cart = store.get_cart(request.user)
 
         if new_quantity > 0:
-            cart_item.quantity = new_quantity
-            cart_item.save()
-            return Response({'message': 'Quantity updated', 'quantity': cart_item.quantity})
+            # ✅ تحقق من توفر الكمية في المخزون
+            product = get_object_or_404(Product, id=line.product_id)
+            error = stock_error(cart, product, new_quantity)
+            if error:
+                return error
+            line = store.set_quantity(request.user, line, new_quantity)
+            return Response({'message': 'Quantity updated', 'quantity': line.quantity})
         else:
-            cart_item.delete()
+            release_holds(cart, [line.product_id])
+            store.remove(request.user, line)
             return Response({'message': 'Item removed because quantity was 0'})
 
     def delete(self, request, item_id):
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-        cart_item.delete()
+        store = get_cart_store()
+        line = self.get_line(request, item_id)
+        release_holds(store.get_cart(request.user), [line.product_id])
+        store.remove(request.user, line)
         return Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
-class ViewCartView(APIView):
-    permission_classes = [IsAuthenticated]
+def cart_response(request, lines, products):
+    """The cart payload (items and total) for `lines` and their loaded `products`."""
+    lines = [line for line in lines if line.product_id in products]
 
-    def get(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        cart_items = cart.items.select_related('product').all()
+    if not lines:
+        return Response({"message": "Your cart is empty!"}, status=status.HTTP_200_OK)
 
-        if not cart_items.exists():
-            return Response({"message": "Your cart is empty!"}, status=status.HTTP_200_OK)
+    priced, total_price = price_lines(
+        ((products[line.product_id], line.quantity) for line in lines), request)
 
-        items = []
-        total_price = 0
+    items = []
+    for line, priced_line in zip(lines, priced):
+        product = priced_line.product
 
-        for item in cart_items:
-            product = item.product
-            # price = product.discount_price if product.discount_price else product.price
-            price = product.price * (1 - product.discount_price / 100) if product.discount_price else product.price
+        # First image for the product (prefetched)
+        image_obj = product.primary_image
+        image_url = request.build_absolute_uri(image_obj.image.url) if image_obj and image_obj.image else None
 
-            item_total = price * item.quantity
-            total_price += item_total
+        items.append({
+            'id': line.item_id, # CartItem ID
+            'product_id': product.id,  # Add Product ID
+            'product_name': product.name,
+            'product_price': float(priced_line.unit_price),
+            'quantity': line.quantity,
+            'stock_quantity': product.stock_quantity,            
+            'total': float(priced_line.line_total),
+            'product_image': image_url,
+        })
 
-            # Get first image for the product
-            image_obj = ProductImage.objects.filter(product=product).first()
-            image_url = request.build_absolute_uri(image_obj.image.url) if image_obj and image_obj.image else None
+    return Response({
+        'items': items,
+        'total_price': float(total_price)
+    })
 
-            items.append({
-                'id': item.id, # CartItem ID
-                'product_id': product.id,  # Add Product ID
-                'product_name': product.name,
-                'product_price': float(price),
-                'quantity': item.quantity,
-                'stock_quantity': product.stock_quantity,            
-                'total': float(item_total),
-                'product_image': image_url,
-            })
 
-        return Response({
-            'items': items,
-            'total_price': float(total_price)
-        })
+class ViewCartView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Cart lines come from the cart store; products and their first
+        # images are two queries whatever the cart size, and prices and
+        # totals come from the shared pricing engine.
+        lines = get_cart_store().lines(request.user)
+        return cart_response(request, lines, cart_products([line.product_id for line in lines]))
+
+
+class CartBatchView(APIView):
+    """
+    Apply a list of add/set/remove operations to the cart in one request
+    and return the updated cart. Either every operation is applied or,
+    on any unknown product or stock shortfall, none is.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        operations = request.data if isinstance(request.data, list) else request.data.get('operations')
+        serializer = CartOperationSerializer(data=operations, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+
+        store = get_cart_store()
+        lines = store.lines(request.user)
+        quantities = {line.product_id: line.quantity for line in lines}
+        targets = {}
+        for operation in serializer.validated_data:
+            product_id = operation['product_id']
+            current = targets.get(product_id, quantities.get(product_id, 0))
+            if operation['op'] == 'add':
+                targets[product_id] = current + operation['quantity']
+            elif operation['op'] == 'set':
+                targets[product_id] = operation['quantity']
+            else:
+                targets[product_id] = 0
+
+        # One fetch covers the stock checks and the response
+        products = cart_products(set(quantities) | set(targets))
+        errors = {}
+        for product_id, quantity in targets.items():
+            product = products.get(product_id)
+            if product is None:
+                errors[product_id] = 'Product not found'
+            elif quantity > 0 and not holds_enabled() and quantity > product.stock_quantity:
+                errors[product_id] = f'Only {product.stock_quantity} items available in stock'
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if holds_enabled():
+                cart = store.get_cart(request.user)
+                for product_id, quantity in sorted(targets.items()):
+                    if quantity > 0:
+                        try:
+                            hold_stock(cart, products[product_id], quantity)
+                        except HoldUnavailable as e:
+                            errors[product_id] = str(e)
+                if errors:
+                    transaction.set_rollback(True)
+                    return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+                release_holds(cart, [product_id for product_id, quantity in targets.items() if quantity <= 0])
+            lines = store.apply_quantities(request.user, targets)
+
+        return cart_response(request, lines, products)
 
 class ClearCartView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        cart_items = cart.items.all()
-        if not cart_items.exists():
+        store = get_cart_store()
+        cart = store.get_cart(request.user)
+        if not store.clear(request.user):
             return Response({"message": "Cart is already empty!"}, status=status.HTTP_200_OK)
 
-        cart_items.delete()
+        release_holds(cart)
         return Response({"message": "Cart cleared successfully"}, status=status.HTTP_204_NO_CONTENT)
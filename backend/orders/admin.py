@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Order , OrderItem
+from .models import DailySalesStats, Order , OrderItem
 # Register your models here.
 
 admin.site.register(Order)
-admin.site.register(OrderItem)
\ No newline at end of file
+admin.site.register(OrderItem)
+admin.site.register(DailySalesStats)
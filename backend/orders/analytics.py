@@ -0,0 +1,110 @@
+"""
+Sales analytics for the admin: best sellers, revenue by category and type,
+average order value and cart-to-order conversion over a date range.
+
+Everything is a grouped aggregate in the database (OrderItem joined to its
+order and product), filtered on plain datetime bounds so the
+(created_at, id) and OrderItem (order, product) indexes apply. Results are
+cached per range for ANALYTICS_CACHE_TTL seconds.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from cart.models import CartItem
+from .models import Order, OrderItem
+
+CACHE_KEY = 'orders:analytics:{start}:{end}:{limit}'
+LINE_TOTAL = F('price') * F('quantity')
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+CENT = Decimal('0.01')
+
+
+def day_bounds(field, start=None, end=None):
+    """Q for `field` within the days [start, end] (either may be None)."""
+    q = Q()
+    tz = timezone.get_current_timezone()
+    if start:
+        q &= Q(**{f'{field}__gte': timezone.make_aware(datetime.combine(start, time.min), tz)})
+    if end:
+        q &= Q(**{f'{field}__lt': timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)})
+    return q
+
+
+def sales_analytics(start=None, end=None, limit=10):
+    key = CACHE_KEY.format(start=start or '', end=end or '', limit=limit)
+    result = cache.get(key)
+    if result is None:
+        result = compute_sales_analytics(start, end, limit)
+        cache.set(key, result, getattr(settings, 'ANALYTICS_CACHE_TTL', 300))
+    return result
+
+
+def compute_sales_analytics(start=None, end=None, limit=10):
+    items = OrderItem.objects.filter(day_bounds('order__created_at', start, end)).order_by()
+    per_product = (items
+        .values('product_id', 'product__name')
+        .annotate(units=Sum('quantity'), revenue=Sum(LINE_TOTAL, output_field=MONEY)))
+
+    def top(ordering):
+        return [
+            {'product_id': row['product_id'], 'name': row['product__name'], 'units': row['units'], 'revenue': row['revenue']}
+            for row in per_product.order_by(f'-{ordering}', 'product_id')[:limit]
+        ]
+
+    by_category = (items
+        .values('product__category_id', 'product__category__name', 'product__category__type')
+        .annotate(units=Sum('quantity'), revenue=Sum(LINE_TOTAL, output_field=MONEY))
+        .order_by('-revenue'))
+    by_type = {}
+    for row in by_category:
+        totals = by_type.setdefault(row['product__category__type'], {'type': row['product__category__type'], 'units': 0, 'revenue': 0})
+        totals['units'] += row['units']
+        totals['revenue'] += row['revenue']
+
+    orders = Order.objects.filter(day_bounds('created_at', start, end))
+    order_totals = orders.aggregate(
+        orders=Count('id'),
+        revenue=Sum('total_price'),
+        average_order_value=Avg('total_price'),
+        buyers=Count('user', distinct=True),
+    )
+
+    # Checked-out carts are emptied, so the carts active in the range are
+    # the open ones with items added in it plus the buyers.
+    open_carts = (CartItem.objects
+        .filter(day_bounds('added_at', start, end))
+        .exclude(cart__user__in=orders.values('user'))
+        .aggregate(count=Count('cart', distinct=True))['count'])
+    buyers = order_totals['buyers']
+    active = buyers + open_carts
+
+    return {
+        'start': start,
+        'end': end,
+        'top_products_by_units': top('units'),
+        'top_products_by_revenue': top('revenue'),
+        'revenue_by_category': [
+            {
+                'category_id': row['product__category_id'],
+                'name': row['product__category__name'],
+                'type': row['product__category__type'],
+                'units': row['units'],
+                'revenue': row['revenue'],
+            }
+            for row in by_category
+        ],
+        'revenue_by_type': sorted(by_type.values(), key=lambda row: row['revenue'], reverse=True),
+        'orders': order_totals['orders'],
+        'revenue': order_totals['revenue'] or 0,
+        'average_order_value': (order_totals['average_order_value'] or Decimal(0)).quantize(CENT),
+        'cart_conversion': {
+            'active_carts': active,
+            'converted_carts': buyers,
+            'rate': round(buyers / active, 4) if active else None,
+        },
+    }
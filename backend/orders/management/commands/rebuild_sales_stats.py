@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from orders.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollup (orders, revenue, paid/COD split, new users) from orders and users."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild days from this date on (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since must be a YYYY-MM-DD date.")
+        days = rebuild_daily_stats(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales stats for {days} days."))
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:49
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_stats(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    User = apps.get_model('users', 'User')
+    DailySalesStats = apps.get_model('orders', 'DailySalesStats')
+    rows = defaultdict(dict)
+    order_days = (Order.objects
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(
+            orders=Count('id'),
+            revenue=Sum('total_price'),
+            paid_orders=Count('id', filter=Q(is_paid=True)),
+            paid_revenue=Sum('total_price', filter=Q(is_paid=True)),
+            cod_orders=Count('id', filter=Q(payment_status='cod')),
+            cod_revenue=Sum('total_price', filter=Q(payment_status='cod')),
+        )
+        .order_by())
+    for row in order_days:
+        day = row.pop('day')
+        rows[day].update({field: value or 0 for field, value in row.items()})
+    user_days = (User.objects
+        .filter(is_superuser=False)
+        .annotate(day=TruncDate('date_joined'))
+        .values('day')
+        .annotate(new_users=Count('id'))
+        .order_by())
+    for row in user_days:
+        rows[row['day']]['new_users'] = row['new_users']
+    DailySalesStats.objects.bulk_create([DailySalesStats(date=day, **values) for day, values in rows.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_keyset_indexes'),
+        ('users', '0002_user_date_joined'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_orders', models.IntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cod_orders', models.IntegerField(default=0)),
+                ('cod_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('new_users', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
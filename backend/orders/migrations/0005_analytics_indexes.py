@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_daily_sales_stats'),
+        ('products', '0006_product_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'product', 'quantity', 'price'], name='orderitem_order_product_idx'),
+        ),
+    ]
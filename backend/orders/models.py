@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
 from django.conf import settings
 from products.models import Product
+from products.pricing import unit_price
+from .stock import InsufficientStock, release_stock, reserve_stock
 
 ORDER_STATUS_CHOICES = [
     ('pending', 'Pending'),
@@ -22,13 +25,19 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='cod')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
     def calculate_total(self):
-        total = sum([item.price * item.quantity for item in self.items.all()])
-        self.total_price = total
-        self.save()
+        total = self.items.aggregate(total=Sum(F('price') * F('quantity')))['total']
+        self.total_price = total or 0
+        self.save(update_fields=['total_price'])
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -36,21 +45,54 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Analytics group a date range of orders' lines by product; with
+            # quantity and price in the key that reads only the index.
+            models.Index(fields=['order', 'product', 'quantity', 'price'], name='orderitem_order_product_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+    # Single-item path (admin, scripts). Checkout goes through
+    # orders.stock.place_order, which reserves and inserts in bulk.
     def save(self, *args, **kwargs):
         if not self.price:
-            self.price = self.product.price
-        if self.product.stock_quantity < self.quantity:
-            raise ValueError(f"Not enough stock for {self.product.name}. Available: {self.product.stock_quantity}")
-        self.product.stock_quantity -= self.quantity
-        self.product.save()
-        super().save(*args, **kwargs)
-        self.order.calculate_total()
+            self.price = unit_price(self.product)
+        with transaction.atomic():
+            if self._state.adding:
+                try:
+                    reserve_stock({self.product_id: self.quantity})
+                except InsufficientStock:
+                    raise ValueError(f"Not enough stock for {self.product.name}.")
+            super().save(*args, **kwargs)
+            self.order.calculate_total()
 
     def delete(self, *args, **kwargs):
-        self.product.stock_quantity += self.quantity
-        self.product.save()
-        super().delete(*args, **kwargs)
-        self.order.calculate_total()
\ No newline at end of file
+        with transaction.atomic():
+            release_stock({self.product_id: self.quantity})
+            super().delete(*args, **kwargs)
+            self.order.calculate_total()
+
+
+class DailySalesStats(models.Model):
+    """
+    Per-day rollup of orders, revenue and sign-ups, kept current by
+    orders/signals.py and rebuilt with `rebuild_sales_stats`. Dashboards
+    read these rows instead of scanning orders and users.
+    """
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_orders = models.IntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cod_orders = models.IntegerField(default=0)
+    cod_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_users = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders, {self.revenue} EGP"
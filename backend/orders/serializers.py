@@ -1,9 +1,47 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem
 from products.models import Product
+from products.pricing import PriceBook
+from .stock import InsufficientStock, place_order
+
+class BulkProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves against `products` (an in_bulk dict) when the parent list
+    serializer has loaded them, instead of one query per item.
+    """
+    products = None
+
+    def to_internal_value(self, data):
+        if self.products is None:
+            return super().to_internal_value(data)
+        try:
+            return self.products[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        field = self.child.fields['product_id']
+        if isinstance(data, list):
+            ids = set()
+            for item in data:
+                try:
+                    ids.add(int(item['product_id']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            field.products = field.get_queryset().in_bulk(ids)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            field.products = None
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_id = serializers.PrimaryKeyRelatedField(
+    product_id = BulkProductField(
         queryset=Product.objects.all(), source='product'
     )
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -11,7 +49,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['product_id', 'quantity', 'price','product_name']
-        extra_kwargs = {'price': {'required': False}}
+        # Always priced server-side by products.pricing
+        read_only_fields = ['price']
+        list_serializer_class = OrderItemListSerializer
 
     def validate(self, data):
         product = data['product']
@@ -23,7 +63,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        validated_data['price'] = validated_data['product'].price
+        request = self.context.get('request')
+        validated_data['price'] = PriceBook.for_request(request).unit_price(validated_data['product'])
         return super().create(validated_data)
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -47,13 +88,17 @@ class OrderSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         validated_data['user'] = self.context['request'].user
-        order = Order.objects.create(**validated_data)
-        total_price = 0
-        for item_data in items_data:
-            item = OrderItem.objects.create(order=order, **item_data)
-            total_price += item.price * item.quantity
-        order.total_price = total_price
-        order.save()
+        lines = [(item_data['product'], item_data['quantity']) for item_data in items_data]
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(**validated_data)
+                items = place_order(order, lines, self.context['request'])
+        except InsufficientStock as e:
+            product = next(product for product, _ in lines if product.pk == e.product_id)
+            raise serializers.ValidationError(f"Not enough stock for {product.name}.")
+        # Serialize from the created items (their products attached) instead
+        # of reading them back.
+        order._prefetched_objects_cache = {'items': items}
         return order
     
 
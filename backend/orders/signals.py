@@ -0,0 +1,53 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from users.models import User
+from .models import Order
+from .stats import apply_contribution_change, order_contribution, user_contribution
+
+CONTRIBUTIONS = {
+    Order: (order_contribution, ['created_at', 'total_price', 'is_paid', 'payment_status']),
+    User: (user_contribution, ['date_joined', 'is_superuser']),
+}
+
+
+def _apply_on_commit(previous, current):
+    # Outside the writer's transaction; dropped if it rolls back
+    transaction.on_commit(partial(apply_contribution_change, previous, current))
+
+
+def _saved_contribution(sender, pk):
+    contribution, fields = CONTRIBUTIONS[sender]
+    values = sender.objects.filter(pk=pk).values(*fields).first()
+    return contribution(sender(**values)) if values else None
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=User)
+def remember_previous_stats(sender, instance, raw=False, **kwargs):
+    instance._previous_stats = None
+    if raw or instance._state.adding:
+        return
+    update_fields = kwargs.get('update_fields')
+    fields = CONTRIBUTIONS[sender][1]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        instance._previous_stats = False  # nothing the rollup depends on
+        return
+    instance._previous_stats = _saved_contribution(sender, instance.pk)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=User)
+def apply_stats_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_stats', None)
+    if raw or previous is False:
+        return
+    _apply_on_commit(previous, CONTRIBUTIONS[sender][0](instance))
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=User)
+def remove_stats(sender, instance, **kwargs):
+    _apply_on_commit(CONTRIBUTIONS[sender][0](instance), None)
@@ -0,0 +1,143 @@
+"""
+Daily sales rollups (DailySalesStats).
+
+Every order and user contributes a fixed set of counters to the row of the
+day it was created. A write applies the difference between the old and
+the new contribution with one UPDATE ... SET col = col + delta, so rows
+never need recounting; `rebuild_sales_stats` recomputes them from scratch.
+The signals (orders/signals.py) apply it once the write's transaction
+commits, so concurrent checkouts don't wait on the day's row lock while
+their own transaction is still open.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from users.models import User
+from .models import DailySalesStats, Order
+
+STAT_FIELDS = ['orders', 'revenue', 'paid_orders', 'paid_revenue', 'cod_orders', 'cod_revenue', 'new_users']
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+INTERVALS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def order_contribution(order):
+    """(day, {field: value}) this order adds to the rollup, or None."""
+    if order.created_at is None:
+        return None
+    total = order.total_price or 0
+    paid = order.is_paid
+    cod = order.payment_status == 'cod'
+    return timezone.localdate(order.created_at), {
+        'orders': 1,
+        'revenue': total,
+        'paid_orders': int(paid),
+        'paid_revenue': total if paid else 0,
+        'cod_orders': int(cod),
+        'cod_revenue': total if cod else 0,
+    }
+
+
+def user_contribution(user):
+    if user.is_superuser or user.date_joined is None:
+        return None
+    return timezone.localdate(user.date_joined), {'new_users': 1}
+
+
+def apply_contribution_change(previous, current):
+    """
+    Move the rollup from `previous` to `current` (either may be None).
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for contribution, sign in ((previous, -1), (current, 1)):
+        if contribution:
+            day, values = contribution
+            for field, value in values.items():
+                deltas[day][field] += sign * value
+
+    for day, values in deltas.items():
+        values = {field: value for field, value in values.items() if value}
+        if not values:
+            continue
+        with transaction.atomic():
+            DailySalesStats.objects.get_or_create(date=day)
+            DailySalesStats.objects.filter(date=day).update(
+                **{field: F(field) + value for field, value in values.items()}
+            )
+
+
+def rebuild_daily_stats(since=None):
+    """
+    Recompute the rollup rows from orders and users (all days, or from
+    `since` on) with two grouped queries. Returns the number of rows written.
+    """
+    zero = Value(0, output_field=MONEY)
+    orders = Order.objects.all()
+    users = User.objects.filter(is_superuser=False)
+    stats = DailySalesStats.objects.all()
+    if since:
+        orders = orders.filter(created_at__date__gte=since)
+        users = users.filter(date_joined__date__gte=since)
+        stats = stats.filter(date__gte=since)
+
+    rows = defaultdict(dict)
+    order_days = (orders
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(
+            orders=Count('id'),
+            revenue=Coalesce(Sum('total_price'), zero),
+            paid_orders=Count('id', filter=Q(is_paid=True)),
+            paid_revenue=Coalesce(Sum('total_price', filter=Q(is_paid=True)), zero),
+            cod_orders=Count('id', filter=Q(payment_status='cod')),
+            cod_revenue=Coalesce(Sum('total_price', filter=Q(payment_status='cod')), zero),
+        )
+        .order_by())
+    for row in order_days:
+        rows[row.pop('day')].update(row)
+    for row in users.annotate(day=TruncDate('date_joined')).values('day').annotate(new_users=Count('id')).order_by():
+        rows[row['day']]['new_users'] = row['new_users']
+
+    with transaction.atomic():
+        stats.delete()
+        DailySalesStats.objects.bulk_create([
+            DailySalesStats(date=day, **values) for day, values in rows.items()
+        ])
+    return len(rows)
+
+
+def sales_summary(start=None, end=None, interval=None):
+    """
+    Totals over [start, end] (dates, both optional) and, with `interval`
+    ('day', 'week' or 'month'), the same counters per period. Reads one
+    rollup row per day.
+    """
+    stats = DailySalesStats.objects.all()
+    if start:
+        stats = stats.filter(date__gte=start)
+    if end:
+        stats = stats.filter(date__lte=end)
+
+    sums = {
+        field: Coalesce(Sum(field), Value(0, output_field=MONEY) if field.endswith('revenue') else Value(0))
+        for field in STAT_FIELDS
+    }
+    summary = {'totals': stats.aggregate(**sums)}
+    if interval:
+        trunc = INTERVALS[interval]
+        period = trunc('date') if trunc else F('date')
+        summary['series'] = list(stats
+            .annotate(period=period)
+            .values('period')
+            .annotate(**sums)
+            .order_by('period'))
+    return summary
@@ -0,0 +1,96 @@
+"""
+Checkout stock engine.
+
+Stock is taken with conditional updates
+(`UPDATE ... SET stock_quantity = stock_quantity - n WHERE id = ... AND
+stock_quantity >= n`), so two checkouts can never both take the last
+units: the database re-checks the condition on the row it locks. Rows are
+updated in product id order so concurrent orders lock them in the same
+order and cannot deadlock.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Value
+
+from cart.holds import held_by_others, holds_enabled, release_holds
+from cart.models import Cart
+from products.models import Product
+from products.pricing import price_lines
+from products.response_cache import stock_changed
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f"Not enough stock for product {product_id} (requested {requested}).")
+
+
+def _stock_changed(product_ids):
+    # Writes through update() skip the product signals. Record the change
+    # after commit; see stock_changed for what it invalidates and when.
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: stock_changed(product_ids))
+
+
+def reserve_stock(quantities, cart=None):
+    """
+    Take `quantities` ({product_id: quantity}) out of stock, all or nothing.
+    Must run inside a transaction; raises InsufficientStock for the first
+    product that cannot be covered, rolling back the whole reservation.
+
+    In cart-hold mode units held by other carts than `cart` are not
+    available, and `cart`'s own holds on these products are consumed.
+    """
+    if not quantities:
+        return
+    use_holds = holds_enabled()
+    with transaction.atomic():
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            needed = held_by_others(cart) + Value(quantity) if use_holds else quantity
+            updated = (Product.objects
+                .filter(pk=product_id, stock_quantity__gte=needed)
+                .update(stock_quantity=F('stock_quantity') - quantity))
+            if not updated:
+                raise InsufficientStock(product_id, quantity)
+        if use_holds and cart is not None:
+            release_holds(cart, list(quantities))
+    _stock_changed(quantities)
+
+
+def release_stock(quantities):
+    """Put `quantities` ({product_id: quantity}) back into stock."""
+    if not quantities:
+        return
+    with transaction.atomic():
+        for product_id in sorted(quantities):
+            Product.objects.filter(pk=product_id).update(stock_quantity=F('stock_quantity') + quantities[product_id])
+    _stock_changed(quantities)
+
+
+def place_order(order, lines, request=None):
+    """
+    Reserve stock for `lines` ((product, quantity) pairs), insert their
+    OrderItems in one query and store the order total, all in a single
+    transaction. `order` must already be saved. Returns the created items.
+    """
+    from .models import OrderItem
+
+    lines = list(lines)
+    quantities = Counter()
+    for product, quantity in lines:
+        quantities[product.pk] += quantity
+
+    cart = Cart.objects.filter(user_id=order.user_id).first() if holds_enabled() else None
+    priced, total = price_lines(lines, request)
+    with transaction.atomic():
+        reserve_stock(quantities, cart)
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=line.product, quantity=line.quantity, price=line.unit_price)
+            for line in priced
+        ])
+        order.total_price = total
+        order.save(update_fields=['total_price'])
+    return items
@@ -1,3 +1,349 @@
-from django.test import TestCase
+import csv
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from products.home import GENERATION_KEY
+from products.models import Category, Product
+from users.models import User
+from .models import DailySalesStats, Order, OrderItem
+from .stock import InsufficientStock, reserve_stock
+
+
+class CheckoutStockTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Heels', type='women')
+        self.products = [
+            Product.objects.create(name=f'Shoe {i}', description='d', price=100, stock_quantity=5, category=category)
+            for i in range(3)
+        ]
+
+    def checkout(self, quantities):
+        return self.client.post('/api/orders/create/', {
+            'items': [{'product_id': p.id, 'quantity': q} for p, q in zip(self.products, quantities)],
+            'shipping_address': 'Cairo',
+            'payment_status': 'cod',
+        }, format='json')
+
+    def test_reserves_all_lines_and_totals_once(self):
+        response = self.checkout([1, 2, 3])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('stock_quantity', flat=True)), [4, 3, 2])
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, 600)
+        self.assertEqual(order.items.count(), 3)
+
+    def test_short_line_rolls_back_the_whole_order(self):
+        Product.objects.filter(pk=self.products[2].pk).update(stock_quantity=1)
+        response = self.checkout([1, 1, 2])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('stock_quantity', flat=True)), [5, 5, 1])
+
+    def test_checkout_query_count_does_not_grow_with_order_size(self):
+        category = Category.objects.get()
+        many = [
+            Product.objects.create(name=f'Boot {i}', description='d', price=50, stock_quantity=5, category=category)
+            for i in range(10)
+        ]
+
+        def count_queries(products):
+            Order.objects.all().delete()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/orders/create/', {
+                    'items': [{'product_id': p.id, 'quantity': 1} for p in products],
+                    'shipping_address': 'Cairo',
+                    'payment_status': 'cod',
+                }, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(len(response.json()['order']['items']), len(products))
+            return len(ctx)
+
+        # Stock updates are one statement per distinct product by design.
+        self.assertEqual(count_queries(many) - count_queries(many[:1]), 9)
+
+    def test_unknown_product_is_rejected(self):
+        response = self.client.post('/api/orders/create/', {
+            'items': [{'product_id': self.products[0].id, 'quantity': 1}, {'product_id': 999, 'quantity': 1}],
+            'shipping_address': 'Cairo',
+            'payment_status': 'cod',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_reservation_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            reserve_stock({self.products[0].pk: 1, self.products[1].pk: 6})
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('stock_quantity', flat=True)), [5, 5, 5])
+
+    def test_checkout_refreshes_product_pages_at_once_and_listings_per_interval(self):
+        cache.clear()
+        anon = APIClient()
+        clock = [1000.0]  # in the first half of a 30 second bucket
+        urls = [f'/api/products/products/{p.id}/' for p in self.products[:2]] + ['/api/products/type/women/']
+
+        def get_all(etags=None):
+            return [anon.get(url, HTTP_IF_NONE_MATCH=etag) for url, etag in zip(urls, etags or [''] * len(urls))]
+
+        def stock_in(listing):
+            return {item['id']: item['stock_quantity'] for item in listing.data}[self.products[0].id]
+
+        fake_time = SimpleNamespace(time=lambda: clock[0], time_ns=time.time_ns)
+        with mock.patch('products.response_cache.time', fake_time), \
+                override_settings(CATALOG_STOCK_VERSION_INTERVAL=30):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.checkout([1])
+            Order.objects.update(status='shipped')  # not a duplicate of the next one
+            clock[0] += 30
+            etags = [response['ETag'] for response in get_all()]
+            generation = cache.get(GENERATION_KEY)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.checkout([2])
+                self.assertEqual(response.status_code, 201, response.content)
+
+            ordered, other, listing = get_all(etags)
+            self.assertEqual(ordered.status_code, 200)
+            self.assertEqual(ordered.data['stock_quantity'], 2)
+            self.assertEqual(other.status_code, 304)
+            # Listings catch up once the bucket of the change closes
+            self.assertEqual(listing.status_code, 304)
+            clock[0] += 30
+            listing = get_all(etags)[2]
+            self.assertEqual(listing.status_code, 200)
+            self.assertEqual(stock_in(listing), 2)
+        # Checkout never bumps the catalog or the home generation
+        self.assertEqual(cache.get(GENERATION_KEY), generation)
+
+    def test_order_item_delete_restores_stock(self):
+        order = Order.objects.create(user=self.user)
+        item = OrderItem.objects.create(order=order, product=self.products[0], quantity=2)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_quantity, 3)
+        item.delete()
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_quantity, 5)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """
+    Parallel workers race for the same stock; the conditional updates must
+    never sell more than there is.
+    """
+    WORKERS = 8
+    ATTEMPTS = 5
+
+    def test_parallel_workers_never_oversell(self):
+        category = Category.objects.create(name='Heels', type='women')
+        products = [
+            Product.objects.create(name=f'Shoe {i}', description='d', price=100, stock_quantity=10, category=category)
+            for i in range(2)
+        ]
+        sold = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.WORKERS)
+
+        def worker():
+            start.wait()
+            try:
+                for _ in range(self.ATTEMPTS):
+                    # Every attempt wants one of each, in a different
+                    # order per worker: the engine sorts them.
+                    try:
+                        reserve_stock({products[1].pk: 1, products[0].pk: 1})
+                    except InsufficientStock:
+                        continue
+                    except OperationalError:
+                        # SQLite reports lock contention instead of waiting;
+                        # the attempt simply did not happen.
+                        continue
+                    with lock:
+                        sold.append(1)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stock = list(Product.objects.order_by('id').values_list('stock_quantity', flat=True))
+        self.assertLessEqual(len(sold), 10)
+        self.assertEqual(stock, [10 - len(sold)] * 2)
+
+
+class SalesStatsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def dashboard(self, **params):
+        response = self.client.get('/api/orders/admin/dashboard/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_rollup_follows_order_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cod = Order.objects.create(user=self.user, total_price=100, payment_status='cod')
+            card = Order.objects.create(user=self.user, total_price=250, payment_status='stripe')
+            card.is_paid = True
+            card.save()
+            cod.total_price = 120
+            cod.save(update_fields=['total_price'])
+
+        data = self.dashboard()
+        self.assertEqual(data['total_users'], 1)
+        self.assertEqual(data['new_users'], 1)
+        self.assertEqual(data['total_orders'], 2)
+        self.assertEqual(Decimal(str(data['total_sales'])), Decimal('370'))
+        self.assertEqual(data['paid_orders'], 1)
+        self.assertEqual(data['cod_orders'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cod.delete()
+        self.assertEqual(self.dashboard()['total_orders'], 1)
+
+    def test_rollup_is_written_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Order.objects.create(user=self.user, total_price=100)
+            self.assertEqual(DailySalesStats.objects.get().orders, 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(DailySalesStats.objects.get().orders, 1)
+
+    def test_total_users_is_the_live_count(self):
+        User.objects.filter(pk=self.user.pk).update(date_joined=timezone.now() - timedelta(days=10))
+        call_command('rebuild_sales_stats', stdout=StringIO())
+        data = self.dashboard(start=str(timezone.localdate()))
+        self.assertEqual((data['total_users'], data['new_users']), (1, 0))
+
+    def test_dashboard_reads_only_the_rollup(self):
+        Order.objects.create(user=self.user, total_price=100)
+        with CaptureQueriesContext(connection) as ctx:
+            self.dashboard(interval='month')
+        self.assertTrue(ctx.captured_queries)
+        # Plus the live user count
+        tables = [query['sql'] for query in ctx.captured_queries if 'users_user' not in query['sql']]
+        self.assertEqual(len(tables), len(ctx.captured_queries) - 1)
+        for sql in tables:
+            self.assertIn('orders_dailysalesstats', sql)
+
+    def test_series_and_rebuild(self):
+        for days_ago in (0, 1, 40):
+            order = Order.objects.create(user=self.user, total_price=10)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        call_command('rebuild_sales_stats', stdout=StringIO())
+
+        data = self.dashboard(interval='day')
+        self.assertEqual(data['total_orders'], 3)
+        self.assertEqual([row['orders'] for row in data['series']][-2:], [1, 1])
+        month = self.dashboard(interval='month', start=str(timezone.localdate() - timedelta(days=1)))
+        self.assertEqual(month['total_orders'], 2)
+        self.assertEqual(self.client.get('/api/orders/admin/dashboard/', {'interval': 'year'}).status_code, 400)
+
+
+class SalesAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer', password='pass')
+        self.browser = User.objects.create_user(email='browser@example.com', username='browser', password='pass')
+        heels = Category.objects.create(name='Heels', type='women')
+        boots = Category.objects.create(name='Boots', type='men')
+        self.heel = Product.objects.create(name='Heel', description='d', price=100, stock_quantity=50, category=heels)
+        self.boot = Product.objects.create(name='Boot', description='d', price=300, stock_quantity=50, category=boots)
+
+        order = Order.objects.create(user=self.buyer, total_price=700)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.heel, quantity=4, price=100),
+            OrderItem(order=order, product=self.boot, quantity=1, price=300),
+        ])
+        Order.objects.create(user=self.buyer, total_price=300)
+        CartItem.objects.create(cart=Cart.objects.create(user=self.browser), product=self.heel)
+
+    def test_breakdowns(self):
+        response = self.client.get('/api/orders/admin/analytics/', {'limit': 1})
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual([row['name'] for row in data['top_products_by_units']], ['Heel'])
+        self.assertEqual([row['name'] for row in data['top_products_by_revenue']], ['Heel'])
+        self.assertEqual([(row['type'], Decimal(str(row['revenue']))) for row in data['revenue_by_type']],
+                         [('women', Decimal('400')), ('men', Decimal('300'))])
+        self.assertEqual(Decimal(str(data['average_order_value'])), Decimal('500.00'))
+        self.assertEqual(data['cart_conversion'], {'active_carts': 2, 'converted_carts': 1, 'rate': 0.5})
+
+    def test_results_are_cached_per_range(self):
+        self.client.get('/api/orders/admin/analytics/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/orders/admin/analytics/')
+        self.assertEqual(len(ctx), 0)
+        tomorrow = str(timezone.localdate() + timedelta(days=1))
+        data = self.client.get('/api/orders/admin/analytics/', {'start': tomorrow}).json()
+        self.assertEqual(data['orders'], 0)
+        self.assertEqual(data['cart_conversion']['rate'], None)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        buyers = [
+            User.objects.create_user(email=f'buyer{i}@example.com', username=f'buyer{i}', password='pass')
+            for i in range(3)
+        ]
+        for buyer in buyers:
+            Order.objects.create(user=buyer, total_price=100, shipping_address='Cairo, "Zamalek"')
+
+    def export(self, export_format):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/orders/admin/export.{export_format}')
+            self.assertTrue(response.streaming)
+            body = b''.join(response.streaming_content).decode()
+        return response, body, len(ctx)
+
+    def test_csv(self):
+        response, body, queries = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0][:4], ['id', 'created_at', 'user_id', 'user_email'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][3], 'buyer0@example.com')
+        self.assertEqual(rows[1][-1], 'Cairo, "Zamalek"')
+        self.assertEqual(queries, 1)
+
+    def test_ndjson(self):
+        response, body, queries = self.export('ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['username'] for row in rows], ['buyer0', 'buyer1', 'buyer2'])
+        self.assertEqual(rows[0]['total_price'], '100.00')
+
+    def test_admin_only_and_known_formats(self):
+        self.assertEqual(self.client.get('/api/orders/admin/export.xml').status_code, 404)
+        self.client.force_authenticate(User.objects.get(username='buyer0'))
+        self.assertEqual(self.client.get('/api/orders/admin/export.csv').status_code, 403)
@@ -8,6 +8,8 @@ router.register('orders', OrderViewSet)
 
 urlpatterns = [
     path('admin/dashboard/', AdminDashboardView.as_view(), name='admin-dashboard'),
+    path('admin/analytics/', AdminAnalyticsView.as_view(), name='admin-analytics'),
+    path('admin/export.<str:export_format>', OrderExportView.as_view(), name='order-export'),
     path('crud/', include(router.urls)),
     path('my-orders/', UserOrderHistoryView.as_view(), name='user-order-history'),
     path('create/', createOrder, name='create_order'),
@@ -1,20 +1,26 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.utils.dateparse import parse_date
 from users.models import User
 from orders.models import Order, OrderItem
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from .serializers import OrderSerializer, OrderSerializer2
+from .analytics import sales_analytics
+from .stats import INTERVALS, sales_summary
 from rest_framework import status
 from rest_framework import viewsets
 import logging
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 import stripe
 from django.conf import settings
 from datetime import timedelta
 from django.utils import timezone
 import uuid
-from cart.models import Cart, CartItem
+from cart.holds import release_holds
+from cart.store import get_cart_store
+from shoezone.export import ExportView
+from shoezone.pagination import KeysetPagination, paginated_response
+from shoezone.throttling import scoped_throttle
 
 # Define the logger
 logger = logging.getLogger(__name__)
@@ -22,31 +28,113 @@ logger = logging.getLogger(__name__)
 # Stripe setup
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+def _parse_day(value):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
 class AdminDashboardView(APIView):
+    """
+    Sales totals from the daily rollup (orders/stats.py). Optional
+    `start`/`end` (YYYY-MM-DD) limit the range and `interval` (day, week or
+    month) adds a per-period series.
+
+    `total_users` is the live count of non-superusers, whatever the range;
+    `new_users` is the sign-ups in the range from the rollup. Users that
+    existed before date_joined was added are all bucketed on the day of
+    that migration.
+    """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        total_users = User.objects.filter(is_superuser=False).count()
-        total_orders = Order.objects.count()
-        total_sales = Order.objects.aggregate(total=Sum('total_price'))['total'] or 0
+        interval = request.query_params.get('interval')
+        try:
+            start, end = (
+                _parse_day(request.query_params.get(name)) for name in ('start', 'end')
+            )
+            if interval and interval not in INTERVALS:
+                raise ValueError(interval)
+        except ValueError:
+            return Response(
+                {"error": f"Use YYYY-MM-DD dates and an interval of {', '.join(INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        summary = sales_summary(start, end, interval)
+        totals = summary['totals']
         data = {
-            'total_users': total_users,
-            'total_orders': total_orders,
-            'total_sales': total_sales,
+            'total_users': User.objects.filter(is_superuser=False).count(),
+            'new_users': totals['new_users'],
+            'total_orders': totals['orders'],
+            'total_sales': totals['revenue'],
+            'paid_orders': totals['paid_orders'],
+            'paid_sales': totals['paid_revenue'],
+            'cod_orders': totals['cod_orders'],
+            'cod_sales': totals['cod_revenue'],
         }
+        if interval:
+            data['series'] = summary['series']
         return Response(data)
 
 
+class AdminAnalyticsView(APIView):
+    """
+    Best sellers, revenue by category/type, average order value and cart
+    conversion between optional `start`/`end` dates (YYYY-MM-DD); `limit`
+    caps the top-product lists (default 10, at most 100).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            start, end = (
+                _parse_day(request.query_params.get(name)) for name in ('start', 'end')
+            )
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response(
+                {"error": "Use YYYY-MM-DD dates and an integer limit."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(sales_analytics(start, end, limit))
+
+
+class OrderExportView(ExportView):
+    filename = 'orders'
+    columns = [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('user_id', 'user_id'),
+        ('user_email', 'user__email'),
+        ('username', 'user__username'),
+        ('status', 'status'),
+        ('payment_status', 'payment_status'),
+        ('is_paid', 'is_paid'),
+        ('total_price', 'total_price'),
+        ('shipping_address', 'shipping_address'),
+    ]
+
+    def get_queryset(self):
+        return Order.objects.order_by('id')
+
+
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all().order_by('-created_at')
     serializer_class = OrderSerializer2
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([scoped_throttle('create_order')])
 def createOrder(request):
+    # Checkout consistency check: pending cart writes reach the tables first
+    get_cart_store().sync(request.user)
     serializer = OrderSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         # Check for duplicate order
@@ -65,7 +153,6 @@ def createOrder(request):
 
         # Create the order
         order = serializer.save()
-        order.calculate_total()
 
         # Validate total price
         if order.total_price <= 0:
@@ -75,16 +162,16 @@ def createOrder(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Clear the user's cart
-        try:
-            cart = Cart.objects.get(user=request.user)
-            cart.items.all().delete()
+        # Clear the user's cart, and release the holds of lines that were not ordered
+        store = get_cart_store()
+        if store.clear(request.user):
+            release_holds(store.get_cart(request.user))
             logger.info(f"Cart cleared for user {request.user.email} after order {order.id}")
-        except Cart.DoesNotExist:
-            logger.warning(f"No cart found for user {request.user.email}")
+        else:
+            logger.warning(f"No cart items found for user {request.user.email}")
 
         payment_status = serializer.validated_data.get('payment_status', 'cod')
-        response_data = {"order": OrderSerializer(order).data}
+        response_data = {"order": serializer.data}
 
         if payment_status == 'cod':
             logger.info(f"Order {order.id} created with Cash on Delivery for user {request.user.email}")
@@ -189,6 +276,6 @@ class UserOrderHistoryView(APIView):
 
     def get(self, request):
         user = request.user
-        orders = Order.objects.filter(user=user).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        orders = Order.objects.filter(user=user).prefetch_related('items__product')
+        return paginated_response(
+            KeysetPagination(), orders, request, lambda orders: OrderSerializer(orders, many=True).data, view=self)
\ No newline at end of file
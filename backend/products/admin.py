@@ -3,3 +3,4 @@ from .models import *
 
 admin.site.register(Rating)
 admin.site.register(Product)
+admin.site.register(ProductVariant)
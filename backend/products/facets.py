@@ -0,0 +1,136 @@
+from collections import Counter
+
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .filters import filter_products
+from .models import ProductVariant
+
+# (min, max) in EGP, max is exclusive; None means open-ended
+PRICE_BANDS = [
+    (0, 500),
+    (500, 1000),
+    (1000, 2000),
+    (2000, None),
+]
+
+
+def _price_band():
+    whens = []
+    for index, (low, high) in enumerate(PRICE_BANDS):
+        bounds = {'price__gte': low}
+        if high is not None:
+            bounds['price__lt'] = high
+        whens.append(When(then=Value(index), **bounds))
+    return Case(*whens, default=Value(None), output_field=IntegerField())
+
+
+# Facet -> the list filter parameter that selects within it
+FACET_PARAMS = {
+    'categories': 'category',
+    'types': 'type',
+    'materials': 'material',
+    'sizes': 'size',
+    'colors': 'color',
+}
+
+
+def compute_facets(queryset, params):
+    """
+    Count the products of `queryset`, filtered by the product list `params`,
+    per category, type, material, price band, size and color.
+
+    Facets are disjunctive: each one is counted with every filter except its
+    own, so with ?color=black the color facet still lists the other colors
+    (with the counts picking them would give) while the rest narrow down to
+    black products.
+
+    Category, type, material and price band come from a GROUP BY over
+    (category, material, price band), which has at most a few hundred rows,
+    rolled up here; sizes and colors from one UNION of grouped variant
+    counts. That is two queries, plus one grouped query per active
+    category/type/material filter.
+    """
+    def filtered(excluded=None):
+        return filter_products(queryset, {k: v for k, v in params.items() if k != excluded})
+
+    def active(facet):
+        return bool(params.get(FACET_PARAMS[facet]))
+
+    matching = filtered()
+    facets = _product_facets(matching)
+    for facet in ('categories', 'types', 'materials'):
+        if active(facet):
+            facets[facet] = _product_facets(filtered(FACET_PARAMS[facet]))[facet]
+
+    sizes_base = filtered('size') if active('sizes') else matching
+    colors_base = filtered('color') if active('colors') else matching
+    facets.update(_variant_facets(sizes_base, colors_base))
+    return facets
+
+
+def _product_facets(queryset):
+    rows = (queryset
+        .order_by()
+        .annotate(price_band=_price_band())
+        .values('category_id', 'category__name', 'category__type', 'material', 'price_band')
+        .annotate(count=Count('id')))
+
+    total = 0
+    categories = {}
+    types = Counter()
+    materials = Counter()
+    bands = Counter()
+    for row in rows:
+        count = row['count']
+        total += count
+        category = categories.setdefault(row['category_id'], {
+            'id': row['category_id'],
+            'name': row['category__name'],
+            'type': row['category__type'],
+            'count': 0,
+        })
+        category['count'] += count
+        types[row['category__type']] += count
+        if row['material']:
+            materials[row['material']] += count
+        if row['price_band'] is not None:
+            bands[row['price_band']] += count
+
+    return {
+        'total': total,
+        'categories': sorted(categories.values(), key=lambda c: (c['type'], c['name'])),
+        'types': _counted(types),
+        'materials': _counted(materials),
+        'price_bands': [
+            {'min': low, 'max': high, 'count': bands[index]}
+            for index, (low, high) in enumerate(PRICE_BANDS)
+        ],
+    }
+
+
+def _variant_facets(sizes_base, colors_base):
+    sizes = (ProductVariant.objects
+        .filter(product__in=sizes_base.values('pk'))
+        .order_by()
+        .exclude(size='')
+        .values('size')
+        .annotate(facet=Value('size'), count=Count('product_id', distinct=True))
+        .values_list('facet', 'size', 'count'))
+    colors = (ProductVariant.objects
+        .filter(product__in=colors_base.values('pk'))
+        .order_by()
+        .exclude(color='')
+        .values('color')
+        .annotate(facet=Value('color'), count=Count('product_id', distinct=True))
+        .values_list('facet', 'color', 'count'))
+    variant_counts = {'size': [], 'color': []}
+    for facet, value, count in sizes.union(colors, all=True):
+        variant_counts[facet].append({'value': value, 'count': count})
+    return {
+        'sizes': sorted(variant_counts['size'], key=lambda s: s['value']),
+        'colors': sorted(variant_counts['color'], key=lambda c: c['value']),
+    }
+
+
+def _counted(counter):
+    return [{'value': value, 'count': count} for value, count in sorted(counter.items())]
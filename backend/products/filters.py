@@ -1,8 +1,46 @@
 from django_filters import rest_framework as filters
 from .models import Product
-from functools import reduce
-import operator
-from django.db.models import Q
+from .search import search_products
+
+
+def filter_products(queryset, params):
+    """
+    Apply the catalog query parameters (search, category, type, color, size,
+    material) shared by the product list and facet endpoints.
+    """
+    # فلترة حسب subcategory المحددة
+    category_id = params.get('category')
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+
+    # فلترة حسب النوع (MEN / WOMEN) من داخل الكاتيجوري نفسها
+    type_param = params.get('type')
+    if type_param:
+        queryset = queryset.filter(category__type__iexact=type_param)
+
+    # فلترة حسب اللون
+    color = params.get('color')
+    if color:
+        queryset = queryset.with_colors(color.split(','))
+
+    # فلترة حسب المقاس
+    size = params.get('size')
+    if size:
+        queryset = queryset.with_sizes(size.split(','))
+
+    # فلترة حسب الخامة
+    material = params.get('material')
+    if material:
+        queryset = queryset.filter(material__icontains=material)
+
+    # Search بالاسم أو الوصف (full-text, see products/search.py). Last, so
+    # the fuzzy fallback is decided on the already filtered products.
+    search_query = params.get('search')
+    if search_query:
+        queryset = search_products(queryset, search_query)
+
+    return queryset
+
 class ProductFilter(filters.FilterSet):
     size = filters.CharFilter(method='filter_by_size')
     color = filters.CharFilter(method='filter_by_color')
@@ -13,19 +51,7 @@ class ProductFilter(filters.FilterSet):
         fields = []
     
     def filter_by_size(self, queryset, name, value):
-        sizes = [s.strip().upper() for s in value.split(',')]
-        return queryset.filter(
-    reduce(
-        operator.or_,
-        (Q(sizes__icontains=size) for size in sizes)
-    )
-)
+        return queryset.with_sizes(value.split(','))
         
     def filter_by_color(self, queryset, name, value):
-        colors = [c.strip().lower() for c in value.split(',')]
-        return queryset.filter(
-            reduce(
-                operator.or_,
-                (Q(colors__icontains=color) for color in colors)
-            )
-        )   
+        return queryset.with_colors(value.split(','))
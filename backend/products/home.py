@@ -0,0 +1,127 @@
+import threading
+import time
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+
+from .response_cache import STOCK_CHANGED_KEY, stock_version
+from .serializers import get_product_queryset
+
+GENERATION_KEY = 'products:home:generation'
+ENTRY_KEY = 'products:home:{view}:{host}'
+REFRESH_LOCK_KEY = 'products:home:refresh:{view}:{host}'
+
+
+def home_settings():
+    return {
+        'ttl': getattr(settings, 'HOME_PRODUCTS_CACHE_TTL', 300),
+        'stale_ttl': getattr(settings, 'HOME_PRODUCTS_STALE_TTL', 3600),
+        'top_rated_limit': getattr(settings, 'HOME_TOP_RATED_LIMIT', 8),
+        'latest_limit': getattr(settings, 'HOME_LATEST_LIMIT', 3),
+        'background_refresh': getattr(settings, 'HOME_PRODUCTS_BACKGROUND_REFRESH', True),
+    }
+
+
+class PayloadRequest:
+    """
+    The part of a request the product serializers use (absolute image URLs,
+    a per-request PriceBook), so a payload can be built away from the
+    request that triggered it, e.g. on the background refresh thread.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def build_absolute_uri(self, location):
+        return urljoin(self.base_url, location)
+
+
+def build_home_payload(base_url, serializer_class):
+    options = home_settings()
+    products = get_product_queryset(serializer_class)
+    top_rated = (products
+        .filter(average_rating__gte=3, rating_count__gte=1)
+        .order_by('-average_rating', '-rating_count', '-created_at')[:options['top_rated_limit']])
+    latest = products.order_by('-created_at')[:options['latest_limit']]
+
+    context = {'request': PayloadRequest(base_url)}
+    return {
+        'top_rated': serializer_class(top_rated, many=True, context=context).data,
+        'latest': serializer_class(latest, many=True, context=context).data
+    }
+
+
+def invalidate_home_payload():
+    """
+    Mark every cached home payload stale. Readers keep getting the old
+    payload until a background refresh replaces it.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def get_home_payload(request, serializer_class, view):
+    """
+    Serve the home payload from the cache. Within the TTL it is returned
+    as is; after the TTL, or once invalidated, the stale copy is still
+    returned while one background thread rebuilds it. Only a cold cache
+    (first request or after the stale TTL) builds inline.
+    """
+    key = ENTRY_KEY.format(view=view, host=request.get_host())
+    base_url = request.build_absolute_uri('/')
+    values = cache.get_many([GENERATION_KEY, STOCK_CHANGED_KEY, key])
+    generation = values.get(GENERATION_KEY)
+    if generation is None:
+        generation = cache.get_or_set(GENERATION_KEY, 1, timeout=None)
+    # Stock shown on the cards counts too, coarsely (see stock_version)
+    generation = (generation, stock_version(values.get(STOCK_CHANGED_KEY)))
+    entry = values.get(key)
+
+    if entry is None:
+        return _store(key, base_url, serializer_class, generation)['payload']
+
+    if entry['generation'] != generation or entry['fresh_until'] <= time.time():
+        lock_key = REFRESH_LOCK_KEY.format(view=view, host=request.get_host())
+        _refresh_in_background(key, lock_key, base_url, serializer_class, generation)
+    return entry['payload']
+
+
+def _store(key, base_url, serializer_class, generation):
+    options = home_settings()
+    entry = {
+        'generation': generation,
+        'fresh_until': time.time() + options['ttl'],
+        'payload': build_home_payload(base_url, serializer_class),
+    }
+    cache.set(key, entry, timeout=options['ttl'] + options['stale_ttl'])
+    return entry
+
+
+def _refresh_in_background(key, lock_key, base_url, serializer_class, generation):
+    # Only one rebuild at a time per payload; the lock expires on its own
+    # if a refresh dies.
+    if not cache.add(lock_key, 1, timeout=60):
+        return
+
+    if not home_settings()['background_refresh']:
+        try:
+            _store(key, base_url, serializer_class, generation)
+        finally:
+            cache.delete(lock_key)
+        return
+
+    def refresh():
+        # A thread of its own gets its own database connection; treat the
+        # refresh like a request so that connection is closed afterwards.
+        close_old_connections()
+        try:
+            _store(key, base_url, serializer_class, generation)
+        finally:
+            cache.delete(lock_key)
+            connection.close()
+
+    threading.Thread(target=refresh, daemon=True).start()
@@ -0,0 +1,34 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.pricing import PriceBook
+
+
+class Command(BaseCommand):
+    help = "Time products.pricing on synthetic carts (no database access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[10, 100, 500])
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        for size in options['lines']:
+            lines = [
+                (Product(
+                    pk=i,
+                    price=Decimal(rng.randrange(10000, 500000)) / 100,
+                    discount_price=rng.choice([None, Decimal(10), Decimal(25)]),
+                ), rng.randint(1, 5))
+                for i in range(size)
+            ]
+            book = PriceBook()
+            cold = timeit.timeit(lambda: PriceBook().price_lines(lines), number=options['repeat'])
+            warm = timeit.timeit(lambda: book.price_lines(lines), number=options['repeat'])
+            self.stdout.write(
+                f"{size:>5} lines: {cold / options['repeat'] * 1e6:9.1f} µs/cart cold, "
+                f"{warm / options['repeat'] * 1e6:9.1f} µs/cart memoized"
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored rating sum, count, average and star histogram of products from their reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int, help="Only rebuild these products (default: all).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ids = options['product_ids'] or Product.objects.order_by('pk').values_list('pk', flat=True)
+        ids = list(ids)
+        batch_size = options['batch_size']
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                updated += Product.objects.filter(pk__in=ids[start:start + batch_size]).rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} products."))
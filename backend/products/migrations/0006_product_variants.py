@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split(value, normalize):
+    return list(dict.fromkeys(normalize(v.strip()) for v in (value or '').split(',') if v.strip()))
+
+
+def create_variants(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    variants = []
+    for product in Product.objects.only('id', 'sizes', 'colors').iterator(chunk_size=1000):
+        variants.extend(
+            ProductVariant(product_id=product.id, size=size, color=color)
+            for size in split(product.sizes, str.upper) or ['']
+            for color in split(product.colors, str.lower) or ['']
+            if size or color
+        )
+    ProductVariant.objects.bulk_create(variants, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(blank=True, max_length=20)),
+                ('color', models.CharField(blank=True, max_length=50)),
+                ('stock_quantity', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_pr_colors_d27212_idx',
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['size', 'product'], name='products_pr_size_9408b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['color', 'product'], name='products_pr_color_ebee5f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.UniqueConstraint(fields=('product', 'size', 'color'), name='unique_variant_per_product'),
+        ),
+        migrations.RunPython(create_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_variants'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='productvariant',
+            name='stock_quantity',
+        ),
+    ]
@@ -1,8 +1,27 @@
+from functools import reduce
+import operator
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Case, Count, Exists, F, FloatField, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Cast
 from users.models import User
 
 from django.db import models
 
+RATING_STARS = range(1, 6)
+
+
+def parse_sizes(value):
+    """Split a comma-separated sizes string into normalized, unique sizes."""
+    return list(dict.fromkeys(s.strip().upper() for s in (value or '').split(',') if s.strip()))
+
+
+def parse_colors(value):
+    """Split a comma-separated colors string into normalized, unique colors."""
+    return list(dict.fromkeys(c.strip().lower() for c in (value or '').split(',') if c.strip()))
+
 class Category(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -23,6 +42,119 @@ class Category(models.Model):
     def __str__(self):
         return f"{self.name} ({self.type})"
 
+def primary_image_prefetch(lookup='images'):
+    """
+    Prefetch only the first image of each product into `primary_images`
+    (one windowed query for the whole page). `lookup` can traverse a
+    relation, e.g. 'product__images'.
+    """
+    return models.Prefetch(
+        lookup,
+        queryset=ProductImage.objects.order_by('id')[:1],
+        to_attr='primary_images',
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Everything the card serializer needs in a fixed number of queries:
+        the category join and only the first image. Review counts come from
+        the stored rating aggregates.
+        """
+        return (self
+            .select_related('category')
+            .prefetch_related(primary_image_prefetch()))
+
+    def for_detail(self):
+        """
+        Everything the full nested serializer needs, including the users
+        behind each review and rating.
+        """
+        return (self
+            .select_related('category')
+            .prefetch_related('images', 'variants', 'reviews__user', 'ratings__user'))
+
+    def with_sizes(self, sizes):
+        """Products having a variant in any of `sizes` (exact, indexed match)."""
+        return self.filter(Exists(ProductVariant.objects.filter(
+            product=OuterRef('pk'), size__in=parse_sizes(','.join(sizes)),
+        )))
+
+    def with_colors(self, colors):
+        """Products having a variant in any of `colors` (exact, indexed match)."""
+        return self.filter(Exists(ProductVariant.objects.filter(
+            product=OuterRef('pk'), color__in=parse_colors(','.join(colors)),
+        )))
+
+    def adjust_rating(self, added=None, removed=None):
+        """
+        Apply one review rating change to the stored aggregates with a single
+        UPDATE, without reading the product's other reviews.
+        `added`/`removed` are the new and previous star values (or None).
+        """
+        added = added if added in RATING_STARS else None
+        removed = removed if removed in RATING_STARS else None
+        if added == removed:
+            return 0
+
+        delta_sum = (added or 0) - (removed or 0)
+        delta_count = (added is not None) - (removed is not None)
+        changes = {
+            'rating_sum': F('rating_sum') + delta_sum,
+            'rating_count': F('rating_count') + delta_count,
+            'average_rating': Case(
+                When(rating_count__lte=-delta_count, then=Value(0.0)),
+                default=Cast(F('rating_sum') + delta_sum, FloatField())
+                / Cast(F('rating_count') + delta_count, FloatField()),
+                output_field=FloatField(),
+            ),
+        }
+        if added is not None:
+            changes[f'rating_{added}_count'] = F(f'rating_{added}_count') + 1
+        if removed is not None:
+            changes[f'rating_{removed}_count'] = F(f'rating_{removed}_count') - 1
+        return self.update(**changes)
+
+    def rebuild_rating_aggregates(self):
+        """
+        Recompute the stored rating aggregates of these products from their
+        reviews in one grouped query. Returns the number of products updated.
+        """
+        Review = self.model._meta.get_field('reviews').related_model
+        stars = Q(rating__in=RATING_STARS)
+        totals = {
+            row['product_id']: row
+            for row in Review.objects
+                .filter(product__in=self.values('pk'))
+                .values('product_id')
+                .annotate(
+                    rating_sum=Sum('rating', filter=stars, default=0),
+                    rating_count=Count('id', filter=stars),
+                    **{f'rating_{star}_count': Count('id', filter=Q(rating=star)) for star in RATING_STARS},
+                )
+        }
+
+        products = list(self.only('pk'))
+        fields = ['rating_sum', 'rating_count', 'average_rating'] + [f'rating_{star}_count' for star in RATING_STARS]
+        for product in products:
+            row = totals.get(product.pk, {})
+            for field in fields:
+                setattr(product, field, row.get(field, 0))
+            product.average_rating = product.rating_sum / product.rating_count if product.rating_count else 0
+        self.model.objects.bulk_update(products, fields, batch_size=500)
+        return len(products)
+
+    def update_search_vector(self):
+        """
+        Refresh the full-text document of these products (PostgreSQL only).
+        """
+        from .search import PRODUCT_SEARCH_VECTOR, is_postgres
+        if not is_postgres():
+            return 0
+        return self.update(search_vector=PRODUCT_SEARCH_VECTOR)
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
@@ -32,31 +164,126 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     # image = models.ImageField(upload_to='product_images/', null=True, blank=True)
     average_rating = models.FloatField(default=0)
+    # Rating aggregates maintained incrementally from reviews (see adjust_rating)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Comma-separated input; normalized into ProductVariant rows on save
     sizes = models.CharField(max_length=100, blank=True)  
     colors = models.CharField(max_length=100, blank=True)  
     material = models.CharField(max_length=100, blank=True)
+    # Weighted full-text document, maintained by products.signals (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         indexes = [
             models.Index(fields=['name']),
             models.Index(fields=['material']),
-            models.Index(fields=['colors']),
+            # Keyset pagination (see shoezone.pagination)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['average_rating', 'id']),
+            # Full-text and typo-tolerant search (see products.search);
+            # only created on PostgreSQL by migration 0005.
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
         ]
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_variant_spec = (instance.__dict__.get('sizes'), instance.__dict__.get('colors'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Only touch the variant rows when sizes/colors actually changed
+        # (stock updates and the like save the product too).
+        if getattr(self, '_saved_variant_spec', None) != (self.sizes, self.colors):
+            self.sync_variants()
+            self._saved_variant_spec = (self.sizes, self.colors)
+
+    def sync_variants(self):
+        """
+        Make the variant rows match the sizes x colors in the string fields,
+        keeping the rows of variants that still exist.
+        """
+        wanted = [
+            (size, color)
+            for size in parse_sizes(self.sizes) or ['']
+            for color in parse_colors(self.colors) or ['']
+            if size or color
+        ]
+        existing = set(self.variants.values_list('size', 'color'))
+        stale = existing.difference(wanted)
+        if stale:
+            self.variants.filter(
+                reduce(operator.or_, (Q(size=size, color=color) for size, color in stale))
+            ).delete()
+        ProductVariant.objects.bulk_create(
+            [ProductVariant(product=self, size=size, color=color) for size, color in wanted if (size, color) not in existing],
+            ignore_conflicts=True,
+        )
+
+    @property
+    def primary_image(self):
+        images = getattr(self, 'primary_images', None)
+        if images is None:
+            images = self.images.order_by('id')[:1]
+        return images[0] if images else None
+
+    @property
+    def available_sizes(self):
+        return list(dict.fromkeys(v.size for v in self.variants.all() if v.size))
+
+    @property
+    def available_colors(self):
+        return list(dict.fromkeys(v.color for v in self.variants.all() if v.color))
     
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}_count') for star in RATING_STARS}
+
     def update_avg_rating(self):
-        reviews = self.reviews.filter(rating__isnull=False).exclude(rating=0)
-        if reviews.exists():
-            total_score = sum(review.rating for review in reviews)
-            avg_rating = total_score / reviews.count()
-        else:
-            avg_rating = 0
-        self.average_rating = avg_rating
-        self.save()
+        # Full recompute; regular writes go through adjust_rating instead.
+        Product.objects.filter(pk=self.pk).rebuild_rating_aggregates()
+        self.refresh_from_db(fields=[
+            'average_rating', 'rating_sum', 'rating_count',
+            *(f'rating_{star}_count' for star in RATING_STARS),
+        ])
+
+
+class ProductVariant(models.Model):
+    """
+    One size/color combination of a product, for filtering. Stock is tracked
+    on the product (cart lines and orders do not record a variant).
+    """
+    product = models.ForeignKey(Product, related_name='variants', on_delete=models.CASCADE)
+    size = models.CharField(max_length=20, blank=True)
+    color = models.CharField(max_length=50, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'size', 'color'], name='unique_variant_per_product')
+        ]
+        indexes = [
+            models.Index(fields=['size', 'product']),
+            models.Index(fields=['color', 'product']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} ({self.size or '-'} / {self.color or '-'})"
 
 
 class ProductImage(models.Model):
@@ -75,8 +302,4 @@ class Rating(models.Model):
     class Meta:
         unique_together = ('user', 'product')
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.product.update_avg_rating()
-
 
@@ -0,0 +1,79 @@
+"""
+The one place product prices are computed.
+
+`Product.discount_price` is a percentage off `price` (what the storefront
+shows), valid when strictly between 0 and 100. All arithmetic is Decimal
+and unit prices are rounded to cents before being multiplied by
+quantities, so cart, checkout and product pages always agree.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+
+class PricedLine(NamedTuple):
+    product: object
+    quantity: int
+    unit_price: Decimal
+    line_total: Decimal
+
+
+def has_discount(product):
+    discount = product.discount_price
+    return discount is not None and 0 < discount < HUNDRED
+
+
+def unit_price(product):
+    price = Decimal(product.price)
+    if not has_discount(product):
+        return price.quantize(CENT, rounding=ROUND_HALF_UP)
+    return (price * (HUNDRED - Decimal(product.discount_price)) / HUNDRED).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PriceBook:
+    """
+    Unit prices memoized for one request. A unit price depends only on
+    (price, discount_price), so products sharing them are priced once and
+    an edited product is repriced.
+    """
+    REQUEST_ATTR = '_price_book'
+
+    def __init__(self):
+        self._unit_prices = {}
+
+    @classmethod
+    def for_request(cls, request):
+        if request is None:
+            return cls()
+        book = getattr(request, cls.REQUEST_ATTR, None)
+        if book is None:
+            book = cls()
+            setattr(request, cls.REQUEST_ATTR, book)
+        return book
+
+    def unit_price(self, product):
+        key = (product.price, product.discount_price)
+        price = self._unit_prices.get(key)
+        if price is None:
+            price = self._unit_prices[key] = unit_price(product)
+        return price
+
+    def price_lines(self, lines):
+        """
+        Price an iterable of (product, quantity) pairs in one pass.
+        Returns (list of PricedLine, total).
+        """
+        priced = []
+        total = Decimal('0.00')
+        for product, quantity in lines:
+            price = self.unit_price(product)
+            line_total = price * quantity
+            total += line_total
+            priced.append(PricedLine(product, quantity, price, line_total))
+        return priced, total
+
+
+def price_lines(lines, request=None):
+    return PriceBook.for_request(request).price_lines(lines)
@@ -0,0 +1,124 @@
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+PRODUCT_VERSION_KEY = 'catalog:product:{pk}:version'
+STOCK_CHANGED_KEY = 'catalog:stock:changed'
+RESPONSE_KEY = 'catalog:response:{etag}'
+
+
+def stock_version(changed_at):
+    """
+    Coarse version of the stock shown in listings, given the time of the
+    last stock change. Time is cut into CATALOG_STOCK_VERSION_INTERVAL
+    buckets and a change is published when its bucket closes, so listings
+    pick up stock changes at most one interval late and are invalidated at
+    most about once per interval, however many checkouts happen.
+    """
+    if changed_at is None:
+        return 0
+    interval = getattr(settings, 'CATALOG_STOCK_VERSION_INTERVAL', 30)
+    bucket = int(changed_at // interval)
+    if bucket >= int(time.time() // interval):
+        bucket -= 1  # still open
+    return bucket
+
+
+def catalog_version(product_id=None):
+    """
+    Version of the cached catalog: the catalog version plus the coarse stock
+    version, or, for responses about one product, that product's own
+    version in place of the stock version. One cache read.
+    """
+    keys = [CATALOG_VERSION_KEY]
+    keys.append(STOCK_CHANGED_KEY if product_id is None else PRODUCT_VERSION_KEY.format(pk=product_id))
+    values = cache.get_many(keys)
+    version = values.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seeded from the clock so a cache flush never reissues an old version
+        # (and with it an ETag a client may still hold for different content).
+        version = cache.get_or_set(CATALOG_VERSION_KEY, lambda: int(time.time() * 1000), timeout=None)
+    if product_id is None:
+        return f'{version}.{stock_version(values.get(STOCK_CHANGED_KEY))}'
+    return f'{version}.p{values.get(keys[1], 0)}'
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog response and ETag. Called on writes to
+    products, categories, images, variants and reviews.
+    """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def stock_changed(product_ids):
+    """
+    Record a stock change, in one cache write. Called on every checkout,
+    where bumping the whole catalog would empty the response cache once per
+    order: the detail pages of these products are invalidated right away,
+    listings and the home payload once the current stock_version() bucket
+    closes.
+    """
+    versions = {PRODUCT_VERSION_KEY.format(pk=pk): time.time_ns() for pk in product_ids}
+    cache.set_many({**versions, STOCK_CHANGED_KEY: time.time()}, timeout=None)
+
+
+def catalog_etag(request, version):
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    raw = f'{version}|{request.get_host()}|{request.path}|{params}'
+    return '"%s"' % hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def cache_catalog_response(handler=None, *, product_kwarg=None):
+    """
+    Cache a read-only catalog handler's 200 responses, keyed by host, path,
+    normalized query parameters and catalog_version(). With `product_kwarg`
+    (the URL kwarg holding a product id) the key takes that product's
+    version instead of the coarse stock version, so stock_changed()
+    reaches it at once.
+
+    The ETag is derived from the same key, so `If-None-Match` is answered
+    with 304 after a single cache read and no database access.
+    """
+    if handler is None:
+        return partial(cache_catalog_response, product_kwarg=product_kwarg)
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        product_id = kwargs.get(product_kwarg) if product_kwarg else None
+        etag = catalog_etag(request, catalog_version(product_id))
+        headers = {
+            'ETag': etag,
+            'Cache-Control': getattr(settings, 'CATALOG_CACHE_CONTROL', 'public, max-age=0, must-revalidate'),
+        }
+
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = RESPONSE_KEY.format(etag=etag.strip('"'))
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, headers=headers)
+
+        response = handler(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, timeout=getattr(settings, 'CATALOG_RESPONSE_CACHE_TTL', 600))
+            for header, value in headers.items():
+                response[header] = value
+        return response
+    return wrapper
@@ -0,0 +1,85 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+# 'simple' avoids stemming so prefix queries typed in the search box
+# ("snea" -> "sneakers") line up with the indexed lexemes.
+SEARCH_CONFIG = 'simple'
+
+# Weighted document: name above material/colors above description.
+PRODUCT_SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('material', 'colors', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+)
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search_products(queryset, query):
+    """
+    Filter `queryset` to products matching `query`, annotated with a `rank`
+    (higher is better). On PostgreSQL this uses the stored search_vector with
+    prefix matching and falls back to trigram similarity on the name when
+    nothing matches; other databases get a weighted icontains search.
+
+    Apply it after the other filters: the fallback is chosen when nothing in
+    `queryset` matches, so it must already be narrowed to the user's
+    category/type/etc.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    if is_postgres():
+        return _postgres_search(queryset, terms)
+    return _fallback_search(queryset, terms)
+
+
+def _postgres_search(queryset, terms):
+    tsquery = SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        search_type='raw',
+        config=SEARCH_CONFIG,
+    )
+    matches = (queryset
+        .filter(search_vector=tsquery)
+        .annotate(rank=SearchRank(F('search_vector'), tsquery)))
+    if matches.exists():
+        return matches
+
+    # Nothing matched the prefixes: probably a typo, try fuzzy name matching.
+    # `name % term` can use product_name_trgm_idx (cut-off:
+    # pg_trgm.similarity_threshold, 0.3 by default); similarity() is then
+    # only computed for the rows it returns, to order them.
+    term = ' '.join(terms)
+    return (queryset
+        .filter(name__trigram_similar=term)
+        .annotate(rank=TrigramSimilarity('name', term)))
+
+
+def _fallback_search(queryset, terms):
+    weights = [
+        (('name',), 1.0),
+        (('material', 'colors'), 0.4),
+        (('description',), 0.1),
+    ]
+    rank = Value(0.0, output_field=FloatField())
+    matched = Q()
+    for term in terms:
+        term_match = Q()
+        for fields, weight in weights:
+            field_match = Q()
+            for field in fields:
+                field_match |= Q(**{f'{field}__icontains': term})
+            term_match |= field_match
+            rank = rank + Case(When(field_match, then=Value(weight)), default=Value(0.0), output_field=FloatField())
+        matched &= term_match
+    return queryset.filter(matched).annotate(rank=rank)
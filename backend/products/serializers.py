@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Product, Category, ProductImage,Rating
+from .models import Product, Category, ProductImage,Rating, ProductVariant
 from reviews.models import Review
+from . import pricing
+from .pricing import PriceBook
 
 
 
@@ -22,6 +24,12 @@ class ProductImageSerializer(serializers.ModelSerializer):
         model = ProductImage
         fields = ['id', 'image_url', 'image'] 
 
+class ProductVariantSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductVariant
+        fields = ['id', 'size', 'color']
+
+
 class RatingSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
 
@@ -55,6 +63,14 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'product', 'comment', 'rating', 'created_at']
         read_only_fields = ['id', 'user', 'product', 'created_at']
 
+def stored_average_rating(product):
+    """
+    Read the rating maintained on the product row by update_avg_rating
+    instead of aggregating its reviews on every serialization.
+    """
+    return round(product.average_rating, 1) if product.average_rating else None
+
+
 class ProductSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
@@ -68,8 +84,11 @@ class ProductSerializer(serializers.ModelSerializer):
 
     # Calculated / formatted fields
     has_discount = serializers.SerializerMethodField()
-    available_sizes = serializers.SerializerMethodField()
-    available_colors = serializers.SerializerMethodField()
+    final_price = serializers.SerializerMethodField()
+    available_sizes = serializers.ListField(child=serializers.CharField(), read_only=True)
+    available_colors = serializers.ListField(child=serializers.CharField(), read_only=True)
+    variants = ProductVariantSerializer(many=True, read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = Product
@@ -77,22 +96,85 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'price', 'discount_price',
             'stock_quantity', 'category', 'category_id', 'images',
             'average_rating', 'material', 'sizes', 'colors',
-            'has_discount', 'available_sizes', 'available_colors',
+            'has_discount', 'final_price', 'available_sizes', 'available_colors', 'variants',
             'reviews','ratings', 'average_rating',
+            'rating_count', 'rating_histogram',
         ]
+        read_only_fields = ['rating_count']
         # ❌ Remove write_only from sizes and colors so they show in response
         # You can keep them write_only if you only want to return the parsed version
 
     def get_has_discount(self, obj):
-        return obj.discount_price is not None and obj.discount_price < obj.price
+        return pricing.has_discount(obj)
+
+    def get_final_price(self, obj):
+        return str(PriceBook.for_request(self.context.get('request')).unit_price(obj))
+
+    average_rating = serializers.SerializerMethodField()
+
+    def get_average_rating(self, obj):
+        return stored_average_rating(obj)
 
-    def get_available_sizes(self, obj):
-        return [size.strip() for size in obj.sizes.split(',')] if obj.sizes else []
 
-    def get_available_colors(self, obj):
-        return [color.strip() for color in obj.colors.split(',')] if obj.colors else []
+class ProductCardSerializer(serializers.ModelSerializer):
+    """
+    Lightweight product representation for catalog pages: no nested
+    reviews/ratings, only the first image and a rating summary.
+    """
+    has_discount = serializers.SerializerMethodField()
+    final_price = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
+    review_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'price', 'discount_price', 'has_discount', 'final_price',
+            'image', 'average_rating', 'review_count',
+        ]
+
+    def get_has_discount(self, obj):
+        return pricing.has_discount(obj)
+
+    def get_final_price(self, obj):
+        return str(PriceBook.for_request(self.context.get('request')).unit_price(obj))
+
+    def get_image(self, obj):
+        image = obj.primary_image
+        if not image or not image.image:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(image.image.url) if request else image.image.url
 
     def get_average_rating(self, obj):
-        ratings = obj.reviews.all().values_list('rating', flat=True)
-        return round(sum(ratings) / len(ratings), 1) if ratings else None
+        return stored_average_rating(obj)
+
+    def get_review_count(self, obj):
+        return obj.rating_count
+
+
+def get_product_queryset(serializer_class):
+    """
+    Base queryset with the joins/prefetches matching a product serializer.
+    """
+    if serializer_class is ProductCardSerializer:
+        return Product.objects.for_listing()
+    return Product.objects.for_detail()
+
+
+PRODUCT_SERIALIZERS = {
+    'card': ProductCardSerializer,
+    'full': ProductSerializer,
+}
+
+
+def get_product_serializer_class(request, default='full'):
+    """
+    Pick the product representation from the `?view=card|full` query
+    parameter, falling back to the endpoint's default. The full payload
+    stays the default because the storefront reads `images`; clients opt in
+    to the lighter card with `?view=card`.
+    """
+    view = request.query_params.get('view', default) if request else default
+    return PRODUCT_SERIALIZERS.get(view, PRODUCT_SERIALIZERS[default])
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .home import invalidate_home_payload
+from .models import Category, Product, ProductImage, ProductVariant
+from .response_cache import bump_catalog_version
+
+
+@receiver(post_save, sender=Product)
+def refresh_search_vector(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    Product.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_home(sender, **kwargs):
+    invalidate_home_payload()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def invalidate_catalog_responses(sender, **kwargs):
+    bump_catalog_version()
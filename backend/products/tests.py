@@ -1,3 +1,429 @@
-from django.test import TestCase
+import json
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import User
+from reviews.models import Review
+from . import pricing
+from .models import Category, Product, ProductImage
+from .home import invalidate_home_payload
+from .search import PRODUCT_SEARCH_VECTOR
+
+
+@override_settings(HOME_PRODUCTS_BACKGROUND_REFRESH=False)
+class ProductListQueryCountTests(TestCase):
+    """
+    Product list endpoints must issue the same number of queries no matter
+    how many products (and reviews) they return.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Heels', type='women')
+        cls.users = [
+            User.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='pass')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def create_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'Shoe {i}', description='desc', price=100, stock_quantity=5,
+                category=self.category, sizes='38,39', colors='red,black',
+            )
+            ProductImage.objects.create(product=product, image=f'product_images/{i}.jpg')
+            ProductImage.objects.create(product=product, image=f'product_images/{i}b.jpg')
+            for user in self.users:
+                Review.objects.create(user=user, product=product, rating=4, comment='nice')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def assertConstantQueries(self, url):
+        self.create_products(2)
+        few = self.count_queries(url)
+        self.create_products(8)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+
+    def test_product_list(self):
+        self.assertConstantQueries('/api/products/api/products/')
+
+    def test_product_list_card_view(self):
+        self.assertConstantQueries('/api/products/api/products/?view=card')
+
+    def test_products_by_type(self):
+        self.assertConstantQueries('/api/products/type/women/')
+
+    def test_products_by_type_and_category(self):
+        self.assertConstantQueries('/api/products/type/women/Heels/')
+
+    def test_home_products(self):
+        self.assertConstantQueries('/api/products/home/')
+
+    def test_card_view_returns_first_image_only(self):
+        self.create_products(1)
+        response = self.client.get('/api/products/api/products/?view=card')
+        item = response.json()[0]
+        self.assertTrue(item['image'].endswith('product_images/0.jpg'))
+        self.assertEqual(item['review_count'], 3)
+        self.assertNotIn('reviews', item)
+
+
+@override_settings(HOME_PRODUCTS_BACKGROUND_REFRESH=False)
+class ProductRepresentationTests(TestCase):
+    CARD_FIELDS = {
+        'id', 'name', 'price', 'discount_price', 'has_discount', 'final_price',
+        'image', 'average_rating', 'review_count',
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Heels', type='women')
+        product = Product.objects.create(name='Heel', description='d', price=10, category=category)
+        ProductImage.objects.create(product=product, image='product_images/heel.jpg')
+
+    def first_item(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return (data['latest'] if isinstance(data, dict) else data)[0]
+
+    def test_card_view_fields(self):
+        self.assertEqual(set(self.first_item('/api/products/api/products/?view=card')), self.CARD_FIELDS)
+
+    def test_full_view_is_the_default(self):
+        for url in ('/api/products/api/products/', '/api/products/type/women/', '/api/products/home/'):
+            with self.subTest(url=url):
+                item = self.first_item(url)
+                self.assertIn('images', item)
+                self.assertIn('reviews', item)
+                self.assertTrue(item['images'][0]['image'].endswith('product_images/heel.jpg'))
+
+    def test_full_view_is_honored(self):
+        for url in ('/api/products/api/products/?view=full', '/api/products/home/?view=full'):
+            with self.subTest(url=url):
+                item = self.first_item(url)
+                self.assertLess(self.CARD_FIELDS - {'image', 'review_count'}, set(item))
+                self.assertIn('images', item)
+
+
+@override_settings(HOME_PRODUCTS_BACKGROUND_REFRESH=False, HOME_TOP_RATED_LIMIT=2)
+class HomeProductsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Heels', type='women')
+        self.user = User.objects.create_user(email='fan@example.com', username='fan', password='pass')
+        self.products = [
+            Product.objects.create(name=f'Heel {i}', description='d', price=10, category=category)
+            for i in range(3)
+        ]
+        for product in self.products:
+            Review.objects.create(user=self.user, product=product, rating=4)
+
+    def test_cached_payload_is_bounded_and_served_without_queries(self):
+        first = self.client.get('/api/products/home/').json()
+        self.assertEqual(len(first['top_rated']), 2)
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/products/home/').json()
+        self.assertEqual(first, second)
+
+    def test_review_write_serves_stale_then_refreshed_payload(self):
+        before = self.client.get('/api/products/home/').json()
+        other = User.objects.create_user(email='critic@example.com', username='critic', password='pass')
+        Review.objects.create(user=other, product=self.products[2], rating=5)
+
+        stale = self.client.get('/api/products/home/').json()
+        fresh = self.client.get('/api/products/home/').json()
+        self.assertEqual(stale, before)
+        self.assertEqual(fresh['top_rated'][0]['id'], self.products[2].id)
+
+
+@override_settings(HOME_PRODUCTS_BACKGROUND_REFRESH=True)
+class HomeProductsBackgroundRefreshTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Heels', type='women')
+        self.product = Product.objects.create(name='Heel', description='d', price=10, category=category)
+        ProductImage.objects.create(product=self.product, image='product_images/heel.jpg')
+
+    def test_stale_payload_is_rebuilt_on_a_background_thread(self):
+        client = APIClient()
+        before = client.get('/api/products/home/').json()
+
+        Product.objects.filter(pk=self.product.pk).update(name='Slingback')
+        invalidate_home_payload()
+        threads = []
+        start_thread = threading.Thread.start
+
+        def start(thread):
+            threads.append(thread)
+            start_thread(thread)
+
+        with mock.patch.object(threading.Thread, 'start', start):
+            stale = client.get('/api/products/home/').json()
+        self.assertEqual(stale, before)
+        self.assertEqual(len(threads), 1)
+        threads[0].join(timeout=10)
+        self.assertFalse(threads[0].is_alive())
+
+        with self.assertNumQueries(0):
+            fresh = client.get('/api/products/home/').json()
+        self.assertEqual(fresh['latest'][0]['name'], 'Slingback')
+        # Built away from the request, image URLs are still absolute
+        self.assertEqual(fresh['latest'][0]['images'], before['latest'][0]['images'])
+        self.assertTrue(fresh['latest'][0]['images'][0]['image'].startswith('http://testserver/'))
+
+
+class CatalogResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Heels', type='women')
+        self.product = Product.objects.create(name='Pump', description='d', price=10, category=self.category)
+
+    def test_etag_revalidation_skips_the_database(self):
+        url = f'/api/products/products/{self.product.id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_catalog_writes_change_the_etag(self):
+        url = '/api/products/type/women/'
+        etag = self.client.get(url)['ETag']
+        self.product.name = 'Slingback'
+        self.product.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Slingback')
+
+    def test_query_params_are_normalized(self):
+        first = self.client.get('/api/products/type/women/?view=card&page_size=5')['ETag']
+        second = self.client.get('/api/products/type/women/?page_size=5&view=card')['ETag']
+        self.assertEqual(first, second)
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Flats', type='women')
+        self.products = [
+            Product.objects.create(
+                name=f'Flat {i}', description='desc', price=30, category=category,
+                average_rating=i % 3,
+            )
+            for i in range(7)
+        ]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.json()['results'])
+            url = response.json()['next']
+        return ids
+
+    def test_pages_cover_every_product_once(self):
+        ids = self.walk('/api/products/api/products/?page_size=3')
+        self.assertEqual(ids, sorted((p.id for p in self.products), reverse=True))
+
+    def test_unpaged_by_default(self):
+        response = self.client.get('/api/products/type/women/')
+        self.assertEqual([item['id'] for item in response.json()], sorted((p.id for p in self.products), reverse=True))
+
+    def test_rating_sort_breaks_ties_by_id(self):
+        ids = self.walk('/api/products/type/women/?sort=rating&page_size=2')
+        expected = sorted(self.products, key=lambda p: (p.average_rating, p.id), reverse=True)
+        self.assertEqual(ids, [p.id for p in expected])
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Sneakers', type='men')
+        # The description match is older, so id order alone would put it first
+        self.in_description = Product.objects.create(name='Runner', description='a canvas upper', price=40, category=category)
+        self.in_name = Product.objects.create(name='Canvas sneaker', description='light', price=40, category=category)
+        Product.objects.create(name='Loafer', description='leather', price=40, category=category)
+
+    def test_name_matches_rank_first_and_prefixes_match(self):
+        for params in ('', '&page_size=10'):
+            with self.subTest(params=params):
+                response = self.client.get(f'/api/products/api/products/?search=canv{params}')
+                data = response.json()
+                ids = [item['id'] for item in (data['results'] if params else data)]
+                self.assertEqual(ids, [self.in_name.id, self.in_description.id])
+
+    def test_search_is_applied_within_the_category(self):
+        other = Category.objects.create(name='Boots', type='men')
+        Product.objects.create(name='Canvas boot', description='d', price=40, category=other)
+        response = self.client.get(f'/api/products/api/products/?search=canvas&category={other.id}')
+        self.assertEqual([item['name'] for item in response.json()], ['Canvas boot'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text and trigram search need PostgreSQL')
+    def test_fuzzy_fallback_when_the_category_has_no_exact_match(self):
+        # "canvas" matches exactly in Sneakers, so only fuzzy matching finds
+        # "Canvis boot" once the category filter is applied first.
+        other = Category.objects.create(name='Boots', type='men')
+        boot = Product.objects.create(name='Canvis boot', description='d', price=40, category=other)
+        Product.objects.filter(pk=boot.pk).update(search_vector=PRODUCT_SEARCH_VECTOR)
+        response = self.client.get(f'/api/products/api/products/?search=canvas boot&category={other.id}')
+        self.assertEqual([item['id'] for item in response.json()], [boot.id])
+
+
+class ProductVariantFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Sandals', type='women')
+        self.small = Product.objects.create(name='Small', description='d', price=20, category=category, sizes='4, 5', colors='Red')
+        self.large = Product.objects.create(name='Large', description='d', price=20, category=category, sizes='41,42', colors='red, Black')
+
+    def filtered_ids(self, query):
+        response = self.client.get(f'/api/products/api/products/?{query}')
+        return {item['id'] for item in response.json()}
+
+    def test_size_filter_is_exact(self):
+        self.assertEqual(self.filtered_ids('size=4'), {self.small.id})
+        self.assertEqual(self.filtered_ids('size=42,5'), {self.small.id, self.large.id})
+
+    def test_color_filter_is_case_insensitive_and_exact(self):
+        self.assertEqual(self.filtered_ids('color=BLACK'), {self.large.id})
+        self.assertEqual(self.filtered_ids('color=re'), set())
+
+    def test_variants_follow_string_fields(self):
+        self.large.sizes = '42'
+        self.large.save()
+        self.assertEqual(self.large.available_sizes, ['42'])
+        self.assertEqual(self.large.available_colors, ['red', 'black'])
+
+
+class ProductFacetsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        women = Category.objects.create(name='Heels', type='women')
+        men = Category.objects.create(name='Boots', type='men')
+        Product.objects.create(name='A', description='d', price=300, category=women, material='leather', sizes='38,39', colors='red')
+        Product.objects.create(name='B', description='d', price=800, category=women, material='suede', sizes='39', colors='red,black')
+        Product.objects.create(name='C', description='d', price=2500, category=men, material='leather', sizes='44', colors='black')
+
+    def test_counts_in_two_queries(self):
+        with self.assertNumQueries(2):
+            facets = self.client.get('/api/products/facets/').json()
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['types'], [{'value': 'men', 'count': 1}, {'value': 'women', 'count': 2}])
+        self.assertEqual(facets['materials'], [{'value': 'leather', 'count': 2}, {'value': 'suede', 'count': 1}])
+        self.assertIn({'value': '39', 'count': 2}, facets['sizes'])
+        self.assertIn({'value': 'black', 'count': 2}, facets['colors'])
+        self.assertEqual([band['count'] for band in facets['price_bands']], [1, 1, 0, 1])
+
+    def test_counts_respect_list_filters(self):
+        facets = self.client.get('/api/products/facets/?type=women&color=black').json()
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(facets['sizes'], [{'value': '39', 'count': 1}])
+
+    def test_each_facet_ignores_its_own_filter(self):
+        with self.assertNumQueries(3):
+            facets = self.client.get('/api/products/facets/?type=women&color=black').json()
+        # Other colors stay selectable, counted within the type filter
+        self.assertEqual(facets['colors'], [{'value': 'black', 'count': 1}, {'value': 'red', 'count': 2}])
+        # and the type facet is counted within the color filter
+        self.assertEqual(facets['types'], [{'value': 'men', 'count': 1}, {'value': 'women', 'count': 1}])
+        self.assertEqual(facets['materials'], [{'value': 'suede', 'count': 1}])
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Boots', type='men')
+        self.product = Product.objects.create(name='Boot', description='desc', price=50, category=category)
+        self.users = [
+            User.objects.create_user(email=f'rater{i}@example.com', username=f'rater{i}', password='pass')
+            for i in range(3)
+        ]
+
+    def assertAggregates(self, rating_sum, histogram):
+        self.product.refresh_from_db()
+        count = sum(histogram.values())
+        self.assertEqual(self.product.rating_sum, rating_sum)
+        self.assertEqual(self.product.rating_count, count)
+        self.assertEqual(self.product.rating_histogram, histogram)
+        self.assertAlmostEqual(self.product.average_rating, rating_sum / count if count else 0)
+
+    def test_create_update_delete(self):
+        first = Review.objects.create(user=self.users[0], product=self.product, rating=5)
+        Review.objects.create(user=self.users[1], product=self.product, rating=2)
+        self.assertAggregates(7, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        first.rating = 4
+        first.save()
+        self.assertAggregates(6, {1: 0, 2: 1, 3: 0, 4: 1, 5: 0})
+
+        first.delete()
+        self.assertAggregates(2, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+
+        self.users[1].delete()
+        self.assertAggregates(0, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_rebuild_command(self):
+        Review.objects.create(user=self.users[0], product=self.product, rating=3)
+        Review.objects.create(user=self.users[1], product=self.product, rating=4)
+        Product.objects.update(rating_sum=0, rating_count=0, rating_3_count=0, rating_4_count=0, average_rating=0)
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.assertAggregates(7, {1: 0, 2: 0, 3: 1, 4: 1, 5: 0})
+
+
+class PricingTests(TestCase):
+    def test_discount_is_a_percentage_rounded_to_cents(self):
+        self.assertEqual(pricing.unit_price(Product(price=Decimal('99.99'), discount_price=Decimal('15'))), Decimal('84.99'))
+        self.assertEqual(pricing.unit_price(Product(price=Decimal('100'), discount_price=None)), Decimal('100.00'))
+        self.assertFalse(pricing.has_discount(Product(price=Decimal('100'), discount_price=Decimal('0'))))
+
+    def test_price_lines_totals_and_memoizes(self):
+        book = pricing.PriceBook()
+        products = [Product(pk=i, price=Decimal('50'), discount_price=Decimal('10')) for i in range(150)]
+        lines, total = book.price_lines((product, 2) for product in products)
+        self.assertEqual(len(lines), 150)
+        self.assertEqual(lines[0].line_total, Decimal('90.00'))
+        self.assertEqual(total, Decimal('13500.00'))
+        self.assertEqual(len(book._unit_prices), 1)
+
+
+class ProductExportTests(TestCase):
+    def test_export_applies_catalog_filters(self):
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass')
+        client = APIClient()
+        client.force_authenticate(admin)
+        heels = Category.objects.create(name='Heels', type='women')
+        boots = Category.objects.create(name='Boots', type='men')
+        Product.objects.create(name='Pump', description='d', price=100, category=heels)
+        Product.objects.create(name='Chelsea', description='d', price=200, category=boots)
+
+        response = client.get('/api/products/admin/export.ndjson', {'type': 'men'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['name'], row['category']) for row in rows], [('Chelsea', 'Boots')])
@@ -15,6 +15,8 @@ urlpatterns = [
     path('categories/type/<str:type>/', CategoryByTypeView.as_view(), name='categories-by-type'),
     path('type/<str:type>/<str:category>/', ProductsByTypeAndCategoryView.as_view(), name='products-by-category'),
     path('home/', HomeProductsView.as_view(), name='home-products'),
+    path('facets/', ProductFacetsView.as_view(), name='product-facets'),
+    path('admin/export.<str:export_format>', ProductExportView.as_view(), name='product-export'),
 
 ]
 
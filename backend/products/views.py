@@ -2,8 +2,11 @@ from rest_framework import viewsets, generics
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from .models import Product, Category,Rating, ProductImage
-from .serializers import ProductSerializer, CategorySerializer
-from .filters import ProductFilter
+from .serializers import ProductSerializer, CategorySerializer, get_product_serializer_class, get_product_queryset
+from .filters import ProductFilter, filter_products
+from .facets import compute_facets
+from .home import get_home_payload
+from .response_cache import cache_catalog_response
 from django.db.models import Q
 from .serializers import RatingSerializer
 from django.shortcuts import render
@@ -13,7 +16,28 @@ from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnl
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.db.models import Count
+from shoezone.export import ExportView
+from shoezone.pagination import KeysetPagination, RatingKeysetPagination, RankKeysetPagination, paginated_response
+
+
+
+def get_product_pagination_class(request):
+    # ?sort=rating pages on (-average_rating, -id), search results on
+    # (-rank, -id), everything else on (-created_at, -id)
+    sort = request.query_params.get('sort')
+    if sort == 'rating':
+        return RatingKeysetPagination
+    if sort is None and request.query_params.get('search'):
+        return RankKeysetPagination
+    return KeysetPagination
+
 
+def paginated_products(request, view, queryset, serializer_class):
+    return paginated_response(
+        get_product_pagination_class(request)(), queryset, request,
+        lambda products: serializer_class(products, many=True, context={'request': request}).data,
+        view=view,
+    )
 
 
 # For category CRUD operations
@@ -27,67 +51,76 @@ class CategoryViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsAuthenticated, IsAdminUser]  
         return [permission() for permission in permission_classes]  
+
+    @cache_catalog_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
 class HomeProductsView(APIView):
     def get(self, request):
-        top_rated = list(Product.objects
-            .annotate(num_reviews=Count('reviews'))
-            .filter(average_rating__gte=3, num_reviews__gte=1)
-            .order_by('-average_rating', '-num_reviews', '-created_at'))
-
-
-        latest = Product.objects.order_by('-created_at')[:3]
-
-        data = {
-            'top_rated': ProductSerializer(top_rated, many=True).data,
-            'latest': ProductSerializer(latest, many=True).data
-        }
+        # Cached with stale-while-revalidate, see products/home.py
+        view = 'card' if request.query_params.get('view') == 'card' else 'full'
+        serializer_class = get_product_serializer_class(request)
+        data = get_home_payload(request, serializer_class, view)
         return Response(data, status=status.HTTP_200_OK)
     
 # For product search and filtering ONLY
 class ProductListView(generics.ListAPIView):
     serializer_class = ProductSerializer
+    throttle_scope = 'product_search'
 
-    def get_queryset(self):
-        queryset = Product.objects.all()
-
-        # Search بالاسم أو الوصف
-        search_query = self.request.query_params.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
+    def get_throttles(self):
+        # Only full-text searches are expensive enough to budget
+        if not self.request.query_params.get('search'):
+            return []
+        return super().get_throttles()
 
-        # فلترة حسب subcategory المحددة
-        category_id = self.request.query_params.get('category')
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
+    @property
+    def pagination_class(self):
+        return get_product_pagination_class(self.request)
 
-        # فلترة حسب النوع (MEN / WOMEN) من داخل الكاتيجوري نفسها
-        type_param = self.request.query_params.get('type')
-        if type_param:
-            queryset = queryset.filter(category__type__iexact=type_param)
+    def get_serializer_class(self):
+        return get_product_serializer_class(self.request)
 
-        # فلترة حسب اللون
-        color = self.request.query_params.get('color')
-        if color:
-            queryset = queryset.filter(colors__icontains=color)
+    def get_queryset(self):
+        queryset = get_product_queryset(self.get_serializer_class())
+        return filter_products(queryset, self.request.query_params)
 
-        # فلترة حسب المقاس
-        size = self.request.query_params.get('size')
-        if size:
-            queryset = queryset.filter(sizes__icontains=size)
+    def list(self, request, *args, **kwargs):
+        # Unpaged results keep the paginator's order too (rank for searches)
+        return paginated_products(request, self, self.get_queryset(), self.get_serializer_class())
 
-        # فلترة حسب الخامة
-        material = self.request.query_params.get('material')
-        if material:
-            queryset = queryset.filter(material__icontains=material)
 
-        return queryset
+# Filter counts for the catalog sidebar, same parameters as ProductListView
+class ProductFacetsView(APIView):
+    def get(self, request):
+        return Response(compute_facets(Product.objects.all(), request.query_params), status=status.HTTP_200_OK)
 
     
 
+class ProductExportView(ExportView):
+    """Admin export of the catalog; accepts the product list filters."""
+    filename = 'products'
+    columns = [
+        ('id', 'id'),
+        ('name', 'name'),
+        ('category', 'category__name'),
+        ('type', 'category__type'),
+        ('price', 'price'),
+        ('discount_price', 'discount_price'),
+        ('stock_quantity', 'stock_quantity'),
+        ('material', 'material'),
+        ('sizes', 'sizes'),
+        ('colors', 'colors'),
+        ('average_rating', 'average_rating'),
+        ('rating_count', 'rating_count'),
+        ('created_at', 'created_at'),
+    ]
+
+    def get_queryset(self):
+        return filter_products(Product.objects.all(), self.request.query_params).order_by('id')
+
+
 # For product CRUD operations (if needed)
 # class ProductViewSet(viewsets.ModelViewSet):
 #     queryset = Product.objects.all()
@@ -114,7 +147,7 @@ class ProductListView(generics.ListAPIView):
 #             ProductImage.objects.create(product=product, image=img)
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    queryset = Product.objects.for_detail()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
     parser_classes = [MultiPartParser, FormParser]
@@ -148,17 +181,13 @@ class ProductViewSet(viewsets.ModelViewSet):
 # For product details (NEW)
 class ProductDetailView(APIView):
 
+    @cache_catalog_response(product_kwarg='id')
     def get(self, request, id):
         try:
-            product = Product.objects.get(id=id)
-            serializer = ProductSerializer(product, many=False)
+            product = Product.objects.for_detail().get(id=id)
+            serializer = ProductSerializer(product, many=False, context={'request': request})
             
-            product_data = serializer.data
-            product_data['has_discount'] = product.discount_price is not None and product.discount_price < product.price
-            product_data['available_sizes'] = [size.strip() for size in product.sizes.split(',')] if product.sizes else []
-            product_data['available_colors'] = [color.strip() for color in product.colors.split(',')] if product.colors else []
-
-            return Response(product_data, status=status.HTTP_200_OK)
+            return Response(serializer.data, status=status.HTTP_200_OK)
         except Product.DoesNotExist:
             return Response({"detail": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -179,7 +208,7 @@ class RatingListCreateView(APIView):
         serializer = RatingSerializer(ratings, many=True)
 
         response_data = {
-            "avg_rating": product.avg_rating,  # Assuming the product model has an avg_rating field
+            "avg_rating": product.average_rating,
             "ratings": serializer.data,
         }
         return Response(response_data, status=status.HTTP_200_OK)
@@ -201,16 +230,18 @@ class RatingListCreateView(APIView):
     
 #all products for women or men    
 class ProductsByTypeView(APIView):
+    @cache_catalog_response
     def get(self, request, type):
         if type not in ['women', 'men']:
             return Response({"error": "Invalid type."}, status=status.HTTP_400_BAD_REQUEST)
 
-        products = Product.objects.filter(category__type=type)
-        serializer = ProductSerializer(products, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer_class = get_product_serializer_class(request)
+        products = get_product_queryset(serializer_class).filter(category__type=type)
+        return paginated_products(request, self, products, serializer_class)
     
 
 class CategoryByTypeView(APIView):
+    @cache_catalog_response
     def get(self, request, type):
         if type not in ['women', 'men']:
             return Response({"error": "Invalid category type."}, status=status.HTTP_400_BAD_REQUEST)
@@ -220,15 +251,16 @@ class CategoryByTypeView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 class ProductsByTypeAndCategoryView(APIView):
+    @cache_catalog_response
     def get(self, request, type, category):
         try:
             category_obj = Category.objects.get(type=type, name=category)
         except Category.DoesNotExist:
             return Response({"detail": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        products = Product.objects.filter(category=category_obj)
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        serializer_class = get_product_serializer_class(request)
+        products = get_product_queryset(serializer_class).filter(category=category_obj)
+        return paginated_products(request, self, products, serializer_class)
     
     
 
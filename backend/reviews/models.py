@@ -12,13 +12,12 @@ class Review(models.Model):
     class Meta:
         unique_together = ['user', 'product']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"Review by {self.user} on {self.product}"
-    
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.product.update_avg_rating()
 
 
 class ReviewReply(models.Model):
@@ -44,5 +43,10 @@ class Report(models.Model):
     reason = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"Report by {self.user} on {self.report_type}"
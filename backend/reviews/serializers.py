@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Review, ReviewReply
+from .models import Review, ReviewReply, Report
 from products.models import Product
 from django.contrib.auth import get_user_model
 
@@ -60,4 +60,11 @@ class ReviewReplySerializer(serializers.ModelSerializer):
     class Meta:
         model = ReviewReply
         fields = ['id', 'user', 'review', 'text', 'created_at']
-        read_only_fields = ['id', 'created_at', 'user']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'user']
+
+
+class ReportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Report
+        fields = ['id', 'user', 'report_type', 'product', 'review', 'review_reply', 'reason', 'created_at']
+        read_only_fields = ['id', 'created_at', 'user']
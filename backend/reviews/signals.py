@@ -0,0 +1,38 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from products.home import invalidate_home_payload
+from products.response_cache import bump_catalog_version
+from products.models import Product
+from .models import Review
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('product_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def apply_rating_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if previous and previous[0] != instance.product_id:
+        Product.objects.filter(pk=previous[0]).adjust_rating(removed=previous[1])
+        previous = None
+    Product.objects.filter(pk=instance.product_id).adjust_rating(
+        added=instance.rating,
+        removed=previous[1] if previous else None,
+    )
+    invalidate_home_payload()
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Review)
+def remove_rating(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).adjust_rating(removed=instance.rating)
+    invalidate_home_payload()
+    bump_catalog_version()
@@ -4,8 +4,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework import status
 from .models import Review, ReviewReply, Report
-from .serializers import ReviewSerializer, ReviewReplySerializer
+from .serializers import ReviewSerializer, ReviewReplySerializer, ReportSerializer
 from products.models import Product  
+from shoezone.pagination import KeysetPagination, paginated_response
 
 class ReviewListCreateView(APIView):
     """
@@ -19,9 +20,9 @@ class ReviewListCreateView(APIView):
 
     def get(self, request, product_id):
         product = Product.objects.get(id=product_id)
-        reviews = Review.objects.filter(product=product)
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        reviews = Review.objects.filter(product=product).select_related('user', 'product')
+        return paginated_response(
+            KeysetPagination(), reviews, request, lambda reviews: ReviewSerializer(reviews, many=True).data, view=self)
 
     def post(self, request, product_id):
         serializer = ReviewSerializer(data=request.data, context={'product_id': product_id,'user': request.user})
@@ -70,8 +71,8 @@ class ReportListCreateView(APIView):
     def get(self, request):
         # List all reports
         reports = Report.objects.all()
-        serializer = ReportSerializer(reports, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return paginated_response(
+            KeysetPagination(), reports, request, lambda reports: ReportSerializer(reports, many=True).data, view=self)
 
     def post(self, request):
         # Create a new report
@@ -0,0 +1,135 @@
+import json
+from functools import reduce
+import operator
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on every ordering field instead of only the first.
+
+    DRF's CursorPagination filters on the first ordering field and skips ties
+    with an OFFSET. Ending the ordering with a unique column (`id`) makes the
+    position unique, so each page is a single indexed range scan:
+    WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC.
+
+    Paging is opt-in: without `?page_size` or `?cursor` the endpoint keeps
+    returning the whole list as a bare array, which is what existing clients
+    read. Paged responses are `{next, previous, results}`.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._keyset_filter(current_position, reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _keyset_filter(self, position, reverse):
+        """
+        Expand a row comparison over the ordering fields into
+        (a > x) OR (a = x AND b > y) OR ... so any database can use it.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        clauses = []
+        for index, order in enumerate(self.ordering):
+            attr = order.lstrip('-')
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            equal = {field.lstrip('-'): value for field, value in zip(self.ordering[:index], values)}
+            clauses.append(Q(**equal, **{f'{attr}__{lookup}': values[index]}))
+        return reduce(operator.or_, clauses)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([str(getattr(instance, field.lstrip('-'))) for field in ordering])
+
+
+class RatingKeysetPagination(KeysetPagination):
+    ordering = ('-average_rating', '-id')
+
+
+class RankKeysetPagination(KeysetPagination):
+    # For querysets annotated with a search `rank`
+    ordering = ('-rank', '-id')
+
+
+class IdKeysetPagination(KeysetPagination):
+    ordering = ('-id',)
+
+
+def paginated_response(paginator, queryset, request, serialize, view=None):
+    """
+    Response for an APIView listing `queryset` through `paginator`:
+    `serialize(objects)` of one page when paging was requested, of the whole
+    queryset (in the paginator's order) otherwise.
+    """
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    if page is None:
+        return Response(serialize(queryset.order_by(*paginator.ordering)))
+    return paginator.get_paginated_response(serialize(page))
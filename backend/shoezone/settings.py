@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
+from django.conf import global_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # trigram lookups for product search
     
     # Third-party apps
     'rest_framework',
@@ -171,8 +174,75 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
     "rest_framework.permissions.AllowAny",
     ),
+
+    # Throttling (shoezone/throttling.py): views with a throttle_scope get the
+    # budget below, per user when logged in and per IP otherwise
+    "DEFAULT_THROTTLE_CLASSES": (
+    "shoezone.throttling.ScopedThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "login": "10/min",
+        "register": "5/hour",
+        "password_reset": "5/hour",
+        "create_order": "20/min",
+        "product_search": "120/min",
+    },
 }
 
+# Cache (local memory per process; point at Redis/Memcached in production)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shoezone',
+    }
+}
+
+# Home page products (products/home.py)
+HOME_PRODUCTS_CACHE_TTL = 300  # seconds a cached payload counts as fresh
+HOME_PRODUCTS_STALE_TTL = 3600  # extra seconds a stale payload may still be served
+HOME_PRODUCTS_BACKGROUND_REFRESH = True
+HOME_TOP_RATED_LIMIT = 8
+HOME_LATEST_LIMIT = 3
+
+# Anonymous catalog responses (products/response_cache.py)
+CATALOG_RESPONSE_CACHE_TTL = 600
+CATALOG_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+CATALOG_STOCK_VERSION_INTERVAL = 30  # seconds; listings show stock changes at most this late
+
+# Cart stock holds (cart/holds.py): when enabled, adding to the cart sets
+# units aside for CART_HOLD_TTL seconds
+CART_HOLDS_ENABLED = False
+CART_HOLD_TTL = 15 * 60
+
+# Cart storage (cart/store.py). 'cart.store.CachedCartStore' serves carts
+# from the cache with write-behind to the tables (run `flush_carts`
+# periodically); it needs a cache shared by all workers.
+CART_STORE = 'cart.store.DatabaseCartStore'
+CART_STORE_CACHE_ALIAS = 'default'
+CART_STORE_TTL = 24 * 3600
+CART_STORE_LOCK_TIMEOUT = 10  # seconds a per-cart write lock may be held
+
+# Admin sales analytics (orders/analytics.py), cached per date range
+ANALYTICS_CACHE_TTL = 300
+
+# Rows fetched per round trip by the streaming admin exports (shoezone/export.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Cache holding the request throttling counters; must be shared by all workers
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Outgoing email queue (users/outbox.py), delivered by `send_queued_emails`.
+# A failed send is retried after EMAIL_OUTBOX_RETRY_DELAY seconds, doubling
+# each time up to EMAIL_OUTBOX_MAX_RETRY_DELAY, for EMAIL_OUTBOX_MAX_ATTEMPTS tries.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 3600
+EMAIL_OUTBOX_LEASE = 5 * 60  # seconds a claimed batch is hidden from other workers
+
+# Seconds users.authentication.CachedJWTAuthentication keeps a user in the
+# cache (used when it replaces JWTAuthentication in REST_FRAMEWORK)
+AUTH_USER_CACHE_TTL = 60
+
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
@@ -266,4 +336,31 @@ LOGGING = {
 
 # Stripe settings
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY")
-STRIPE_PUBLISHABLE_KEY = config("STRIPE_PUBLISHABLE_KEY")
\ No newline at end of file
+STRIPE_PUBLISHABLE_KEY = config("STRIPE_PUBLISHABLE_KEY")
+
+# Password hashing (users/hashers.py). New passwords are hashed with
+# PASSWORD_HASHING_ALGORITHM ('pbkdf2', 'scrypt' or 'argon2', which needs
+# argon2-cffi) at the cost below; hashes made with another algorithm or cost
+# keep working and are rehashed on the user's next login. Tune per
+# environment with `manage.py benchmark_login`.
+PASSWORD_HASHING_ALGORITHM = config('PASSWORD_HASHING_ALGORITHM', default='pbkdf2')
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=870000, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 14, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = 8
+PASSWORD_SCRYPT_PARALLELISM = 1
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=102400, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=8, cast=int)
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHING_ALGORITHM]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHING_ALGORITHM
+] + [
+    # Django's other defaults (PBKDF2SHA1, BCryptSHA256, ...) so existing
+    # hashes still verify; the ones users.hashers replaces are left out
+    path for path in global_settings.PASSWORD_HASHERS
+    if path.rsplit('.', 1)[1] not in {hasher.rsplit('.', 1)[1] for hasher in _PASSWORD_HASHERS.values()}
+]
@@ -0,0 +1,112 @@
+"""
+Request throttling on a shared cache.
+
+`ScopedThrottle` is DRF's ScopedRateThrottle with a sliding-window counter
+in place of the per-client timestamp list. Views opt in with a
+`throttle_scope` (function views: `@throttle_classes([scoped_throttle(
+'scope')])`) and the budget for each scope is
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope]. Authenticated requests are
+counted per user, anonymous ones per client IP.
+
+Each client has one counter per fixed window (the rate's period). The
+request rate is estimated as the current window's count plus the previous
+window's count weighted by how much of it still overlaps the sliding
+window, which smooths the burst at window edges the way a token bucket
+refilling at the same rate would.
+
+A request is counted first, with one atomic incr on the current window.
+The previous window can add at most `num_requests * (1 - elapsed)` to the
+estimate, so while the current count stays under `num_requests *
+elapsed` the request is accepted without reading it: one cache round
+trip. Only near the limit is the previous count read, and a rejected
+request is uncounted again with a decr. The cache (THROTTLE_CACHE_ALIAS)
+must be shared by all workers for budgets to hold across them.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        window = int(window)
+        current_key = f'{self.key}:{window}'
+        self.elapsed = offset / self.duration
+        # Requests before this one in the current window
+        self.current = self.count(current_key) - 1
+        self.previous = 0
+        if self.current < self.num_requests * self.elapsed:
+            return True  # under budget whatever the previous window holds
+
+        if self.current < self.num_requests:
+            self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+            if self.previous * (1 - self.elapsed) + self.current < self.num_requests:
+                return True
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            pass  # window counter expired or evicted; nothing left to uncount
+        return self.throttle_failure()
+
+    def count(self, key):
+        """Add this request to the window counter `key`; returns the new count."""
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # First request of the window; two windows cover the lookback
+            if self.cache.add(key, 1, 2 * self.duration):
+                return 1
+            return self.cache.incr(key)
+
+    def wait(self):
+        """Seconds until the estimate drops back under the budget."""
+        if self.current >= self.num_requests:
+            return self.duration * (1 - self.elapsed)
+        # previous * (1 - elapsed') + current < num_requests
+        needed = 1 - (self.num_requests - self.current) / self.previous
+        return max(math.ceil((needed - self.elapsed) * self.duration), 1)
+
+
+class ScopedThrottle(SlidingWindowThrottle):
+    """Throttles views that set `throttle_scope`; leaves the rest alone."""
+    scope_attr = 'throttle_scope'
+
+    def __init__(self):
+        # The rate depends on the view, see allow_request
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None) or getattr(self, 'default_scope', None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+def scoped_throttle(scope):
+    """ScopedThrottle bound to `scope`, for function views (`@throttle_classes`)."""
+    return type(f'ScopedThrottle[{scope}]', (ScopedThrottle,), {'default_scope': scope})
@@ -0,0 +1,64 @@
+"""
+JWT authentication that skips the users table on most requests.
+
+`CachedJWTAuthentication` reads the user id from the verified token claims
+and rebuilds the User from a small cache entry, falling back to the
+database (and simplejwt's usual checks) on a miss. The entry holds only
+what authentication and permission checks read (CACHED_FIELDS) plus the
+token version (simplejwt's hash of the password hash, checked when
+CHECK_REVOKE_TOKEN is on), never the password hash itself. The other fields
+of the rebuilt user are deferred and load from the database on first
+access.
+
+Entries live AUTH_USER_CACHE_TTL seconds and are dropped whenever the user
+is saved or deleted (users/signals.py), which covers block/unblock,
+password changes and profile updates. Enable it in
+REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES']; changes made with
+queryset.update() are only picked up after the TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+CACHE_KEY = 'users:auth:{user_id}'
+CACHED_FIELDS = ['id', 'email', 'username', 'is_active', 'is_staff', 'is_superuser']
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(CACHE_KEY.format(user_id=user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # raises InvalidToken
+        key = CACHE_KEY.format(user_id=user_id)
+        entry = cache.get(key)
+        if entry is None:
+            user = super().get_user(validated_token)
+            entry = (
+                {name: getattr(user, name) for name in CACHED_FIELDS},
+                get_md5_hash_password(user.password),
+            )
+            cache.set(key, entry, getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+            return user
+
+        values, token_version = entry
+        # Same checks as JWTAuthentication.get_user, against the cached copy
+        if api_settings.CHECK_USER_IS_ACTIVE and not values['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != token_version:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return self.cached_user(values)
+
+    def cached_user(self, values):
+        """A User with the cached fields loaded and the rest deferred."""
+        names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in values]
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model), names, [values[name] for name in names])
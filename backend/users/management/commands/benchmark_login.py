@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils.module_loading import import_string
+from rest_framework.test import APIRequestFactory
+from users.models import User
+from users.views import MyTokenObtainPairView
+
+
+class Command(BaseCommand):
+    help = (
+        "Time logins through MyTokenObtainPairView, one after another (so on one core), "
+        "for each configured password hasher at its current cost. Nothing is saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+        parser.add_argument('--algorithms', nargs='+', help="Hasher algorithms to time (default: all in PASSWORD_HASHERS).")
+
+    def handle(self, *args, **options):
+        paths = {import_string(path).algorithm: path for path in settings.PASSWORD_HASHERS}
+        view = MyTokenObtainPairView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        credentials = {'email': 'benchmark-login@example.com', 'password': 'benchmark-password'}
+        for algorithm in options['algorithms'] or list(paths):
+            if algorithm not in paths:
+                self.stderr.write(f"{algorithm}: not in PASSWORD_HASHERS")
+                continue
+            with override_settings(PASSWORD_HASHERS=[paths[algorithm]]), transaction.atomic():
+                try:
+                    User.objects.create_user(username='benchmark-login', is_active=True, **credentials)
+                except ValueError as e:  # hasher library not installed
+                    self.stderr.write(f"{algorithm}: {e}")
+                    continue
+                start = time.perf_counter()
+                for _ in range(options['logins']):
+                    response = view(factory.post('/api/users/login/', credentials, format='json'))
+                    assert response.status_code == 200, response.data
+                elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f"{algorithm:>14}: {options['logins'] / elapsed:8.1f} logins/s per core, "
+                f"{elapsed / options['logins'] * 1000:7.1f} ms/login"
+            )
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from users.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Send queued emails in batches over one SMTP connection per batch. With --interval, keep polling every N seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=int, default=0, help="Seconds between polls (default: send once).")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(batch_size=options['batch_size'])
+            self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,46 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+SEARCH_INDEXES = [
+    models.Index(OpClass(Upper('email'), name='varchar_pattern_ops'), name='user_email_upper_idx'),
+    models.Index(OpClass(Upper('username'), name='varchar_pattern_ops'), name='user_username_upper_idx'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    # Operator classes only exist on PostgreSQL; elsewhere the unique
+    # indexes on email/username are all there is.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('users', 'User')
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(User, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('users', 'User')
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_date_joined'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='user', index=index)
+                for index in SEARCH_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_indexes, drop_search_indexes),
+            ],
+        ),
+    ]
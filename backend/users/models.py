@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
 class UserManager(BaseUserManager):
@@ -32,6 +35,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=30, blank=True)
     is_active = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
+    date_joined = models.DateTimeField(default=timezone.now)
 
     mobile = models.CharField(max_length=15, unique=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
@@ -44,6 +48,15 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'  # Use email for authentication
     REQUIRED_FIELDS = ['username']  # Fields required when creating a user via createsuperuser
 
+    class Meta:
+        indexes = [
+            # Case-insensitive prefix search in the admin user list
+            # (UPPER(col) LIKE 'TERM%'); pattern ops make LIKE use the index
+            # under any collation. PostgreSQL only, see migration 0003.
+            models.Index(OpClass(Upper('email'), name='varchar_pattern_ops'), name='user_email_upper_idx'),
+            models.Index(OpClass(Upper('username'), name='varchar_pattern_ops'), name='user_username_upper_idx'),
+        ]
+
     def __str__(self):
         return self.username
     
@@ -59,3 +72,31 @@ class Address(models.Model):
     def __str__(self):
         return f"{self.address_line_1}, {self.city}"
     
+
+class OutgoingEmail(models.Model):
+    """Email queued by a request and sent by the `send_queued_emails` worker (users/outbox.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html = models.BooleanField(default=False)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoingemail_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,118 @@
+"""
+Outgoing email queue.
+
+Views call `queue_email()`, which only inserts an OutgoingEmail row (in the
+caller's transaction, so a rolled-back signup sends nothing), and return
+right away. The `send_queued_emails` command delivers due emails in
+batches over one SMTP connection per batch; a failed message is retried
+with exponential backoff and marked failed after EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+A batch is claimed by pushing its `next_attempt_at` past the lease, so
+several workers can run side by side without sending the same email twice
+(short of one dying mid-batch, after which the lease expires and the
+emails go out again).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, body, to, from_email=None, html=False):
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        html=html,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failed try."""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+    return min(base * 2 ** (attempts - 1), getattr(settings, 'EMAIL_OUTBOX_MAX_RETRY_DELAY', 3600))
+
+
+def claim_batch(batch_size, now=None):
+    """Lease up to `batch_size` due emails to this worker and return them."""
+    now = now or timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE', 5 * 60))
+    with transaction.atomic():
+        ids = list(OutgoingEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size])
+        OutgoingEmail.objects.filter(id__in=ids).update(next_attempt_at=lease, attempts=F('attempts') + 1)
+    return list(OutgoingEmail.objects.filter(id__in=ids).order_by('next_attempt_at', 'id'))
+
+
+def to_message(email, connection):
+    message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+    if email.html:
+        message.content_subtype = 'html'
+    return message
+
+
+def _failed(email, error, now):
+    email.last_error = str(error)
+    if email.attempts >= getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5):
+        email.status = 'failed'
+        logger.error(f"Giving up on email {email.pk} after {email.attempts} attempts: {error}")
+    else:
+        email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+        logger.warning(f"Email {email.pk} failed (attempt {email.attempts}), retrying: {error}")
+
+
+def send_batch(batch_size=50, now=None):
+    """
+    Send one batch of due emails over a single connection. Returns
+    (sent, failed) counts for the batch; (0, 0) means the queue is empty.
+    """
+    emails = claim_batch(batch_size, now)
+    if not emails:
+        return 0, 0
+    now = now or timezone.now()
+    sent = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _failed(email, error, now)
+    else:
+        try:
+            for email in emails:
+                try:
+                    to_message(email, connection).send()
+                except Exception as error:
+                    _failed(email, error, now)
+                else:
+                    email.status = 'sent'
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    sent.append(email)
+        finally:
+            connection.close()
+    OutgoingEmail.objects.bulk_update(emails, ['status', 'sent_at', 'next_attempt_at', 'last_error'])
+    return len(sent), len(emails) - len(sent)
+
+
+def send_queued_emails(batch_size=50, now=None):
+    """Send every due email, batch by batch. Returns (sent, failed) totals."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = send_batch(batch_size, now)
+        if not sent and not failed:
+            return total_sent, total_failed
+        total_sent += sent
+        total_failed += failed
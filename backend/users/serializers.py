@@ -49,8 +49,8 @@ class UserSerializer(serializers.ModelSerializer):
         return obj.is_staff
     
     def get_addresses(self, obj):
-        addresses = Address.objects.filter(user=obj)
-        return AddressSerializer(addresses, many=True).data
+        # Served from prefetch_related('addresses') in list views
+        return AddressSerializer(obj.addresses.all(), many=True).data
 
 class UserSerializerWithToken(UserSerializer):
     token=serializers.SerializerMethodField(read_only=True)
@@ -59,6 +59,9 @@ class UserSerializerWithToken(UserSerializer):
         fields=['id','_id','username','email','name','isAdmin','token','is_staff','is_active']
     
     def get_token(self,obj):
+        # Login passes the access token it already minted
+        if 'access_token' in self.context:
+            return self.context['access_token']
         token=RefreshToken.for_user(obj)
         return str(token.access_token)
 
@@ -1,3 +1,287 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from shoezone import settings as project_settings
+from shoezone.throttling import ScopedThrottle
+from .authentication import CachedJWTAuthentication
+from .models import Address, OutgoingEmail, User
+from .outbox import queue_email, send_batch, send_queued_emails
+
+
+class AdminUserListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_users(self, count, start=0):
+        for i in range(start, start + count):
+            user = User.objects.create_user(email=f'shopper{i}@example.com', username=f'shopper{i}', password='pass')
+            for n in range(2):
+                Address.objects.create(user=user, address_line_1=f'{n} Nile St', city='Cairo', postcode='11511', country='Egypt')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def test_address_queries_do_not_grow_with_users(self):
+        for url in ('/api/users/', '/api/users/crud/users/'):
+            with self.subTest(url=url):
+                self.add_users(1, start=100 if 'crud' in url else 0)
+                few = self.count_queries(url)
+                self.add_users(8, start=200 if 'crud' in url else 10)
+                self.assertEqual(self.count_queries(url), few)
+
+    def test_list_is_a_bare_array_unless_paging_is_requested(self):
+        self.add_users(3)
+        for url in ('/api/users/', '/api/users/crud/users/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIsInstance(response.data, list)
+                first = self.client.get(url, {'page_size': 2}).data
+                self.assertEqual(len(first['results']), 2)
+                second = self.client.get(first['next']).data
+                self.assertFalse(
+                    {user['id'] for user in first['results']} & {user['id'] for user in second['results']})
+
+    def test_addresses_are_serialized(self):
+        self.add_users(1)
+        response = self.client.get('/api/users/crud/users/')
+        [user] = response.data
+        self.assertEqual(len(user['addresses']), 2)
+
+    def test_search_is_a_case_insensitive_prefix_match(self):
+        self.add_users(3)
+        User.objects.create_user(email='other@example.com', username='Shopper-x', password='pass')
+        response = self.client.get('/api/users/crud/users/', {'search': 'SHOPPER'})
+        self.assertEqual(len(response.data), 4)
+        response = self.client.get('/api/users/', {'search': 'shopper1@'})
+        self.assertEqual([user['email'] for user in response.data], ['shopper1@example.com'])
+        response = self.client.get('/api/users/', {'search': 'example'})
+        self.assertEqual(response.data, [])
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('Connection unexpectedly closed')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTests(TestCase):
+    def test_registration_queues_the_activation_email(self):
+        response = APIClient().post('/api/users/register/', {
+            'first_name': 'Mona', 'last_name': 'Adel', 'email': 'mona@example.com', 'password': 'pass',
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(mail.outbox, [])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.to, email.html, email.status), (['mona@example.com'], True, 'pending'))
+
+        call_command('send_queued_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Activate Your Account')
+        self.assertEqual(mail.outbox[0].content_subtype, 'html')
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+
+    def test_password_reset_queues_email(self):
+        User.objects.create_user(email='mona@example.com', username='mona', password='pass')
+        response = APIClient().post('/api/users/password-reset-request/', {'email': 'mona@example.com'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(OutgoingEmail.objects.get().subject, 'Password Reset Request')
+
+    def test_sends_in_batches(self):
+        for i in range(5):
+            queue_email('Hi', 'Body', [f'user{i}@example.com'])
+        self.assertEqual(send_batch(batch_size=2), (2, 0))
+        self.assertEqual(send_queued_emails(batch_size=2), (3, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutgoingEmail.objects.exclude(status='sent').exists())
+
+    @override_settings(
+        EMAIL_BACKEND='users.tests.FailingEmailBackend',
+        EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_DELAY=60, EMAIL_OUTBOX_MAX_RETRY_DELAY=3600,
+    )
+    def test_failures_back_off_then_give_up(self):
+        email = queue_email('Hi', 'Body', ['user@example.com'])
+        now = timezone.now()
+        self.assertEqual(send_queued_emails(now=now), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60))
+        self.assertIn('Connection unexpectedly closed', email.last_error)
+
+        # Not due yet
+        self.assertEqual(send_queued_emails(now=now + timedelta(seconds=30)), (0, 0))
+
+        now += timedelta(seconds=60)
+        send_queued_emails(now=now)
+        email.refresh_from_db()
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=120))
+
+        send_queued_emails(now=now + timedelta(seconds=120))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 3))
+
+
+class TokenAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='mona@example.com', username='mona', password='pass', is_active=True)
+        self.auth = CachedJWTAuthentication()
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/api/cart/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.auth.authenticate(request)[0]
+
+    def test_login_returns_the_minted_access_token(self):
+        response = APIClient().post('/api/users/login/', {'email': 'mona@example.com', 'password': 'pass'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['token'], response.data['access'])
+        self.assertEqual(self.authenticate(response.data['token']), self.user)
+
+    def test_cached_user_skips_the_database(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.authenticate(token), self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+            self.assertEqual((user.pk, user.email, user.is_active, user.is_staff), (self.user.pk, 'mona@example.com', True, False))
+
+    def test_cache_holds_no_password_hash(self):
+        self.user.first_name = 'Mona'
+        self.user.save()
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.authenticate(token)
+        values, _ = cache.get(f'users:auth:{self.user.pk}')
+        self.assertNotIn('password', values)
+        self.assertNotIn(self.user.password, repr(cache.get(f'users:auth:{self.user.pk}')))
+
+        user = self.authenticate(token)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.first_name, 'Mona')
+        self.assertTrue(user.check_password('pass'))
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.authenticate(token)
+        self.user.first_name = 'Mona'
+        self.user.save()
+        self.assertEqual(self.authenticate(token).first_name, 'Mona')
+
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pass')
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.patch(f'/api/users/crud/users/{self.user.pk}/block/')
+        self.assertEqual(response.status_code, 200, response.content)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+
+class PasswordHashingTests(TestCase):
+    def login(self):
+        return APIClient().post('/api/users/login/', {'email': 'mona@example.com', 'password': 'pass'})
+
+    @override_settings(PASSWORD_HASHERS=['users.hashers.PBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_new_passwords_use_the_configured_cost(self):
+        user = User.objects.create_user(email='mona@example.com', username='mona', password='pass')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_login_rehashes_with_the_current_policy(self):
+        with self.settings(PASSWORD_HASHERS=['users.hashers.PBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = User.objects.create_user(email='mona@example.com', username='mona', password='pass', is_active=True)
+        with self.settings(PASSWORD_HASHERS=['users.hashers.PBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+        with self.settings(
+            PASSWORD_HASHERS=['users.hashers.ScryptPasswordHasher', 'users.hashers.PBKDF2PasswordHasher'],
+            PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10,
+        ):
+            self.assertEqual(self.login().status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('scrypt$'))
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_hashes_from_other_django_hashers_still_verify(self):
+        with self.settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']):
+            user = User.objects.create_user(email='mona@example.com', username='mona', password='pass', is_active=True)
+        self.assertTrue(user.password.startswith('pbkdf2_sha1$'))
+        with self.settings(PASSWORD_HASHERS=project_settings.PASSWORD_HASHERS, PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.assertEqual(self.login().status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(PASSWORD_HASHERS=['users.hashers.PBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_benchmark_leaves_no_users_behind(self):
+        out = StringIO()
+        call_command('benchmark_login', logins=2, stdout=out)
+        self.assertIn('pbkdf2_sha256', out.getvalue())
+        self.assertFalse(User.objects.exists())
+
+
+@mock.patch.object(ScopedThrottle, 'THROTTLE_RATES', {'login': '2/min', 'register': '1/hour'})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def allowed(self, now, user=None):
+        request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        request.user = user
+        throttle = ScopedThrottle()
+        throttle.timer = lambda: now
+        return throttle.allow_request(request, SimpleNamespace(throttle_scope='login'))
+
+    def test_sliding_window(self):
+        self.assertEqual([self.allowed(t) for t in (0, 10, 20)], [True, True, False])
+        # Halfway through the next window half of the previous one still counts
+        self.assertEqual([self.allowed(t) for t in (90, 90)], [True, False])
+        self.assertTrue(self.allowed(180))
+
+    def test_requests_well_under_the_budget_cost_one_cache_call(self):
+        throttle_cache = caches['default']
+        self.allowed(0)
+        with mock.patch.object(throttle_cache, 'get', wraps=throttle_cache.get) as get, \
+                mock.patch.object(throttle_cache, 'incr', wraps=throttle_cache.incr) as incr:
+            self.assertTrue(self.allowed(90))
+        self.assertEqual((incr.call_count, get.call_count), (1, 0))
+
+    def test_rejection_survives_an_evicted_counter(self):
+        self.allowed(0)
+        self.allowed(0)
+        throttle_cache = caches['default']
+        with mock.patch.object(throttle_cache, 'decr', side_effect=ValueError):
+            self.assertFalse(self.allowed(0))
+
+    def test_counts_users_and_ips_separately(self):
+        user = User.objects.create_user(email='mona@example.com', username='mona', password='pass')
+        self.assertEqual([self.allowed(0), self.allowed(0), self.allowed(0)], [True, True, False])
+        self.assertEqual([self.allowed(0, user), self.allowed(0, user), self.allowed(0, user)], [True, True, False])
+
+    def test_endpoints_answer_429_with_retry_after(self):
+        client = APIClient()
+        for _ in range(2):
+            self.assertEqual(client.post('/api/users/login/', {'email': 'x@example.com', 'password': 'x'}).status_code, 401)
+        response = client.post('/api/users/login/', {'email': 'x@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+        data = {'first_name': 'Mona', 'last_name': 'Adel', 'email': 'mona@example.com', 'password': 'pass'}
+        self.assertEqual(client.post('/api/users/register/', data).status_code, 200)
+        self.assertEqual(client.post('/api/users/register/', data).status_code, 429)
@@ -13,6 +13,7 @@ urlpatterns = [
     path('users/register/',views.registerUser,name="register"),
     path('activate/<uidb64>/<token>/',views.ActivateAccountView.as_view(),name='activate'),
     path('users/',views.getUsers,name="getUsers"),
+    path('users/admin/export.<str:export_format>', views.UserExportView.as_view(), name='user-export'),
     path('users/login/', views.MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('users/profile/',views.getUserProfiles,name="getUserProfiles"),
 
@@ -11,74 +11,72 @@ from django.contrib.auth.hashers import make_password
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 # from django.contrib.auth.models import User
 # from .serializers import SignUpSerializer,UserSerializer
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework.decorators import parser_classes
+from rest_framework.decorators import parser_classes, throttle_classes
+from shoezone.export import ExportView
+from shoezone.pagination import IdKeysetPagination, paginated_response
+from shoezone.throttling import scoped_throttle
 
 # for sending mails and generate token
 from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_decode,urlsafe_base64_encode
 from .utils import TokenGenerator,generate_token
 from django.utils.encoding import force_bytes, DjangoUnicodeDecodeError ,force_str
-from django.core.mail import EmailMessage
+from django.db import transaction
+from .outbox import queue_email
 from django.conf import settings
 from django.views.generic import View
-from smtplib import SMTPException
 import logging
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.core.mail import send_mail
 
 
 
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
+@throttle_classes([scoped_throttle('register')])
 def registerUser(request):
     data = request.data
     profile_picture = request.FILES.get('profile_picture')
     try:
-        user = User.objects.create(
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            username=data['email'],
-            email=data['email'],
-            password=make_password(data['password']),
-            profile_picture=profile_picture,
-            is_active=False
-        )
-        # Generate token for sending mail
-        email_subject = "Activate Your Account"
-        domain = "http://localhost:5173"
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        token = generate_token.make_token(user)
-        activation_url = f"{domain}/activate/{uid}/{token}/"
-        
-        message = render_to_string(
-            "activate.html",
-            {
-                'user': user,
-                'domain': domain,
-                'uid': uid,
-                'token': token,
-                'activation_url': activation_url
-            }
-        )
-        email_message = EmailMessage(
-            email_subject, message, settings.EMAIL_HOST_USER, [data['email']]
-        )
-        email_message.content_subtype = "html"
-        email_message.send()
+        with transaction.atomic():
+            user = User.objects.create(
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                username=data['email'],
+                email=data['email'],
+                password=make_password(data['password']),
+                profile_picture=profile_picture,
+                is_active=False
+            )
+            # Generate token for sending mail
+            email_subject = "Activate Your Account"
+            domain = "http://localhost:5173"
+            uid = urlsafe_base64_encode(force_bytes(user.pk))
+            token = generate_token.make_token(user)
+            activation_url = f"{domain}/activate/{uid}/{token}/"
+
+            message = render_to_string(
+                "activate.html",
+                {
+                    'user': user,
+                    'domain': domain,
+                    'uid': uid,
+                    'token': token,
+                    'activation_url': activation_url
+                }
+            )
+            # Delivered by the send_queued_emails worker
+            queue_email(email_subject, message, [data['email']], settings.EMAIL_HOST_USER, html=True)
         serialize = UserSerializerWithToken(user, many=False)
         return Response(serialize.data)
-    except SMTPException as e:
-        message = {'details': 'Failed to send email. Please check your email configuration.'}
-        print(f"SMTPException: {e}")
-        return Response(message, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
         message = {'details': str(e)}
         print(e)
@@ -113,7 +111,7 @@ class ActivateAccountView(APIView):
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         data = super().validate(attrs)
-        serializer=UserSerializerWithToken(self.user).data
+        serializer=UserSerializerWithToken(self.user, context={'access_token': data['access']}).data
         for k,v in serializer.items():
             data[k]=v
         return data 
@@ -121,6 +119,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_scope = 'login'
 
 
 
@@ -128,27 +127,57 @@ class MyTokenObtainPairView(TokenObtainPairView):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def  getUserProfiles(request):
-    user=request.user
+    # One query for the whole row; request.user may carry only the
+    # authentication fields (users/authentication.py)
+    user=User.objects.get(pk=request.user.pk)
     serializer=UserSerializer(user,many=False)
     return Response({"user": serializer.data})
 
+def search_users(queryset, term):
+    """Prefix match on email or username (indexed, case-insensitive)."""
+    term = (term or '').strip()
+    if not term:
+        return queryset
+    return queryset.filter(Q(email__istartswith=term) | Q(username__istartswith=term))
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def getUsers(request):
-    users=User.objects.all()
-    serializer=UserSerializer(users,many=True)
-    return Response(serializer.data)
-
+    users=search_users(User.objects.prefetch_related('addresses'), request.query_params.get('search'))
+    return paginated_response(IdKeysetPagination(), users, request, lambda users: UserSerializer(users, many=True).data)
+
+
+class UserExportView(ExportView):
+    filename = 'users'
+    columns = [
+        ('id', 'id'),
+        ('email', 'email'),
+        ('username', 'username'),
+        ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+        ('mobile', 'mobile'),
+        ('country', 'country'),
+        ('birthdate', 'birthdate'),
+        ('is_active', 'is_active'),
+        ('is_staff', 'is_staff'),
+        ('date_joined', 'date_joined'),
+    ]
 
+    def get_queryset(self):
+        return User.objects.order_by('id')
 
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]  
+    # Pages only with ?page_size/?cursor; UserManagement.jsx reads the bare list
+    pagination_class = IdKeysetPagination
 
     def get_queryset(self):
-        return User.objects.filter(is_superuser=False)
+        users = User.objects.filter(is_superuser=False).prefetch_related('addresses')
+        return search_users(users, self.request.query_params.get('search'))
 
     @action(detail=True, methods=['patch'])
     def block(self, request, pk=None):
@@ -266,6 +295,7 @@ def get_my_address(request):
     # Password Reset Request
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('password_reset')])
 def passwordResetRequest(request):
     email = request.data.get('email')
     if not email:
@@ -293,13 +323,7 @@ def passwordResetRequest(request):
             f"Thanks,\nThe Shoe-Zone Team"
         )
 
-        send_mail(
-            email_subject,
-            email_message,
-            settings.EMAIL_HOST_USER,
-            [email],
-            fail_silently=False,
-        )
+        queue_email(email_subject, email_message, [email], settings.EMAIL_HOST_USER)
 
         # Return the reset URL in the response only in non-production environments
         response_data = {"details": "Password reset email sent successfully."}
@@ -309,12 +333,6 @@ def passwordResetRequest(request):
     except User.DoesNotExist:
         # Don't reveal whether the email exists for security reasons
         return Response({"details": "Password reset email sent if the email exists."})
-    except SMTPException as e:
-        print(f"SMTPException: {e}")
-        return Response(
-            {"details": "Failed to send email. Please check your email configuration."},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
     except Exception as e:
         print(e)
         return Response({"details": str(e)}, status=status.HTTP_400_BAD_REQUEST)